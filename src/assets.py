@@ -0,0 +1,183 @@
+import gzip
+import hashlib
+import json
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+from manifest import hash_file, stale_outputs
+from static_sync import collect_files, copy_file
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+FINGERPRINT_EXTENSIONS = (
+    ".css", ".js", ".png", ".jpg", ".jpeg", ".gif", ".svg", ".webp", ".ico", ".woff", ".woff2"
+)
+COMPRESS_EXTENSIONS = (".html", ".css", ".js", ".xml", ".svg", ".json", ".txt")
+FINGERPRINT_LENGTH = 10
+ASSET_REF_PATTERN = re.compile(r'(href|src)="(/[^"]*)"')
+
+_table = {}
+
+
+def table():
+    return _table
+
+
+def set_table(assets):
+    global _table
+    _table = assets
+
+
+def table_version():
+    # pages embed fingerprinted urls, so they are rebuilt when this changes
+    data = json.dumps(_table, sort_keys=True).encode()
+    return hashlib.sha256(data).hexdigest()[:16]
+
+
+def asset_url(url):
+    return _table.get(url, url)
+
+
+def rewrite_asset_urls(html):
+    # used once on the template; markdown links and images go through
+    # asset_url as their nodes are built
+    if not _table:
+        return html
+    return ASSET_REF_PATTERN.sub(
+        lambda match: f'{match.group(1)}="{asset_url(match.group(2))}"', html
+    )
+
+
+def fingerprinted_path(path, digest):
+    stem, ext = os.path.splitext(path)
+    return f"{stem}.{digest[:FINGERPRINT_LENGTH]}{ext}"
+
+
+def fingerprint_assets(src_dir, dest_dir, manifest):
+    # every static asset also gets a copy named after its content, which
+    # can be served with a far-future cache lifetime; the plain copy stays
+    # for anything linking to it from outside the site
+    files = [
+        (src_path, dest_path, "/" + os.path.relpath(src_path, src_dir).replace(os.sep, "/"))
+        for src_path, dest_path in collect_files(src_dir, dest_dir)
+        if src_path.lower().endswith(FINGERPRINT_EXTENSIONS)
+    ]
+    # image variants are generated straight into dest_dir, and end up in
+    # srcset, so they need content-addressed names just the same
+    files.extend(
+        (variant["dest"], variant["dest"], variant["url"])
+        for image in manifest.images.values()
+        for variant in image["variants"]
+    )
+    assets = {}
+    entries = {}
+    copied = 0
+    for src_path, dest_path, url in files:
+        st = os.stat(src_path)
+        entry = manifest.fingerprints.get(src_path)
+        fresh = (
+            entry is not None
+            and entry["size"] == st.st_size
+            and entry["mtime_ns"] == st.st_mtime_ns
+            and os.path.exists(entry["dest"])
+        )
+        if not fresh:
+            digest = hash_file(src_path)
+            entry = {
+                "size": st.st_size,
+                "mtime_ns": st.st_mtime_ns,
+                "hash": digest,
+                "dest": fingerprinted_path(dest_path, digest),
+            }
+            dirname = os.path.dirname(entry["dest"])
+            if dirname:
+                os.makedirs(dirname, exist_ok=True)
+            copy_file(src_path, entry["dest"])
+            copied += 1
+        entries[src_path] = entry
+        assets[url] = fingerprinted_path(url, entry["hash"])
+
+    removed = stale_outputs(manifest.fingerprints, entries)
+    for path in removed:
+        if os.path.isfile(path):
+            print(f"Removing stale fingerprinted asset {path}")
+            os.remove(path)
+    manifest.fingerprints = entries
+    set_table(assets)
+    print(f"Fingerprinted assets: {len(assets)} assets, {copied} copied, {len(removed)} removed")
+    return assets
+
+
+def collect_compressible(dest_dir):
+    paths = []
+    for dirpath, dirnames, filenames in os.walk(dest_dir):
+        dirnames.sort()
+        for filename in sorted(filenames):
+            if filename.lower().endswith(COMPRESS_EXTENSIONS):
+                paths.append(os.path.join(dirpath, filename))
+    return paths
+
+
+def compressed_paths(path):
+    paths = [path + ".gz"]
+    if brotli is not None:
+        paths.append(path + ".br")
+    return paths
+
+
+def compress_outputs(dest_dir, manifest, threads=4):
+    # writes .gz (and, with the brotli module, .br) siblings so the server
+    # can send them as they are; files whose content hash is unchanged
+    # since the last build keep their existing siblings
+    entries = {}
+    todo = []
+    for path in collect_compressible(dest_dir):
+        digest = hash_file(path)
+        entries[path] = {"hash": digest}
+        old_entry = manifest.compressed.get(path)
+        if (
+            old_entry is not None
+            and old_entry["hash"] == digest
+            and old_entry["outputs"] == compressed_paths(path)
+            and all(os.path.exists(output) for output in old_entry["outputs"])
+        ):
+            entries[path]["outputs"] = old_entry["outputs"]
+        else:
+            todo.append(path)
+
+    # zlib and brotli release the gil while compressing
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        for path, outputs in zip(todo, executor.map(compress_file, todo)):
+            entries[path]["outputs"] = outputs
+
+    old_outputs = {output for entry in manifest.compressed.values() for output in entry["outputs"]}
+    new_outputs = {output for entry in entries.values() for output in entry["outputs"]}
+    removed = sorted(old_outputs - new_outputs)
+    for path in removed:
+        if os.path.isfile(path):
+            os.remove(path)
+    manifest.compressed = entries
+    formats = "gzip and brotli" if brotli is not None else "gzip"
+    print(
+        f"Compressed outputs ({formats}): {len(todo)} compressed, "
+        f"{len(entries) - len(todo)} unchanged, {len(removed)} removed"
+    )
+
+
+def compress_file(path):
+    with open(path, "rb") as f:
+        data = f.read()
+    # mtime=0 keeps the .gz bytes the same from build to build
+    encoded = [(path + ".gz", gzip.compress(data, compresslevel=9, mtime=0))]
+    if brotli is not None:
+        encoded.append((path + ".br", brotli.compress(data)))
+    for output, compressed in encoded:
+        tmp_path = f"{output}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(compressed)
+        os.replace(tmp_path, output)
+    return [output for output, _ in encoded]
@@ -0,0 +1,539 @@
+import argparse
+import json
+import os
+import random
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import htmlnode
+import inline_markdown
+import markdown_blocks
+import textnode
+from htmlnode import HTMLNode, LeafNode, ParentNode
+from inline_markdown import (
+    split_nodes_delimiter,
+    split_nodes_image,
+    split_nodes_link,
+    text_to_textnodes,
+)
+from markdown_blocks import markdown_to_blocks, markdown_to_html_node
+from textnode import TextNode, TextType
+
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(SRC_DIR)
+RESULTS_PATH = os.path.join(".cache", "bench.jsonl")
+
+# a run this much slower than the last comparable one is flagged
+REGRESSION_THRESHOLD = 0.10
+
+DEFAULT_MIX = {
+    "paragraph": 5,
+    "heading": 2,
+    "ulist": 1,
+    "olist": 1,
+    "quote": 1,
+    "code": 1,
+}
+
+WORDS = (
+    "ring hobbit shire wizard elf dwarf river mountain road forest song "
+    "lore king ship star tower bridge gate horse ale pipe map journey"
+).split()
+
+
+class CorpusShape:
+    def __init__(
+        self,
+        pages=200,
+        depth=2,
+        blocks=40,
+        inline_density=0.3,
+        images=1,
+        mix=None,
+        seed=1,
+    ):
+        self.pages = pages
+        self.depth = depth
+        self.blocks = blocks
+        # chance that any given word group carries inline markup
+        self.inline_density = inline_density
+        # images per page, drawn from a pool of image files
+        self.images = images
+        self.mix = dict(mix or DEFAULT_MIX)
+        self.seed = seed
+
+    def to_json(self):
+        return {
+            "pages": self.pages,
+            "depth": self.depth,
+            "blocks": self.blocks,
+            "inline_density": self.inline_density,
+            "images": self.images,
+            "mix": self.mix,
+            "seed": self.seed,
+        }
+
+    def __repr__(self):
+        return f"CorpusShape({self.to_json()})"
+
+
+def image_pool(shape):
+    return max(1, min(shape.pages, 50))
+
+
+def synthetic_text(rng, shape, words=16):
+    parts = []
+    for _ in range(words):
+        group = " ".join(rng.choice(WORDS) for _ in range(rng.randint(1, 3)))
+        if rng.random() >= shape.inline_density:
+            parts.append(group)
+            continue
+        kind = rng.randrange(5)
+        if kind == 0:
+            parts.append(f"**{group}**")
+        elif kind == 1:
+            parts.append(f"_{group}_")
+        elif kind == 2:
+            parts.append(f"`{group}`")
+        elif kind == 3:
+            parts.append(f"[{group}]({page_link(rng.randrange(shape.pages), shape.depth)})")
+        else:
+            parts.append(f"![{group}](/images/img{rng.randrange(image_pool(shape))}.png)")
+    return " ".join(parts)
+
+
+def synthetic_block(rng, shape, kind):
+    if kind == "paragraph":
+        return "\n".join(synthetic_text(rng, shape) for _ in range(rng.randint(1, 4)))
+    if kind == "heading":
+        return "#" * rng.randint(2, 4) + " " + synthetic_text(rng, shape, 4)
+    if kind == "ulist":
+        return "\n".join(f"- {synthetic_text(rng, shape, 6)}" for _ in range(rng.randint(2, 8)))
+    if kind == "olist":
+        return "\n".join(
+            f"{i + 1}. {synthetic_text(rng, shape, 6)}" for i in range(rng.randint(2, 8))
+        )
+    if kind == "quote":
+        return "\n".join(f"> {synthetic_text(rng, shape, 8)}" for _ in range(rng.randint(1, 3)))
+    if kind == "code":
+        lines = [f"    {rng.choice(WORDS)}({rng.randrange(100)})" for _ in range(rng.randint(2, 10))]
+        return "```\n" + "\n".join(lines) + "\n```"
+    raise ValueError(f"invalid block kind: {kind}")
+
+
+def synthetic_page(rng, shape, n):
+    kinds = list(shape.mix)
+    weights = [shape.mix[kind] for kind in kinds]
+    blocks = [f"# Page {n}"]
+    for i in range(shape.blocks):
+        blocks.append(synthetic_block(rng, shape, rng.choices(kinds, weights)[0]))
+        if i < shape.images:
+            blocks.append(f"![figure {i}](/images/img{rng.randrange(image_pool(shape))}.png)")
+    return "\n\n".join(blocks) + "\n"
+
+
+def page_path(n, depth):
+    # spreads pages over a tree up to depth directories deep
+    parts = [f"section{(n // 10 ** (level + 1)) % 10}" for level in range(depth)]
+    return os.path.join(*parts, f"page{n}", "index.md")
+
+
+def page_link(n, depth):
+    # the url page_path(n, depth) is served at, so corpus links resolve
+    return "/" + os.path.dirname(page_path(n, depth)).replace(os.sep, "/") + "/"
+
+
+def synthetic_pages(shape):
+    rng = random.Random(shape.seed)
+    for n in range(shape.pages):
+        yield page_path(n, shape.depth), synthetic_page(rng, shape, n)
+
+
+def generate_corpus(root, shape):
+    content_dir = os.path.join(root, "content")
+    images_dir = os.path.join(root, "static", "images")
+    os.makedirs(images_dir)
+    total = 0
+    for rel_path, markdown in synthetic_pages(shape):
+        path = os.path.join(content_dir, rel_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(markdown)
+        total += len(markdown.encode())
+
+    rng = random.Random(shape.seed)
+    for i in range(image_pool(shape)):
+        with open(os.path.join(images_dir, f"img{i}.png"), "wb") as f:
+            f.write(rng.randbytes(4096))
+    shutil.copy(os.path.join(REPO_DIR, "static", "index.css"), os.path.join(root, "static"))
+    shutil.copy(os.path.join(REPO_DIR, "template.html"), root)
+    return total
+
+
+def chained_text_to_textnodes(text):
+    # the five-pass pipeline text_to_textnodes used before the single-pass
+    # scanner, kept as the baseline to compare against
+    nodes = [TextNode(text, TextType.TEXT)]
+    nodes = split_nodes_delimiter(nodes, "**", TextType.BOLD)
+    nodes = split_nodes_delimiter(nodes, "_", TextType.ITALIC)
+    nodes = split_nodes_delimiter(nodes, "`", TextType.CODE)
+    nodes = split_nodes_image(nodes)
+    nodes = split_nodes_link(nodes)
+    return nodes
+
+
+def best_time(fn, inputs, repeat=5):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for item in inputs:
+            fn(item)
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+
+def traced_peak(fn, inputs):
+    tracemalloc.start()
+    for item in inputs:
+        fn(item)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+
+def measure(name, fn, inputs, size, repeat):
+    elapsed = best_time(fn, inputs, repeat)
+    return {
+        "name": name,
+        "seconds": elapsed,
+        "items_per_sec": len(inputs) / elapsed,
+        "mb_per_sec": size / elapsed / 1e6,
+        "peak_mb": traced_peak(fn, inputs) / 1e6,
+    }
+
+
+def bench_parse(shape, repeat):
+    pages = [markdown for _, markdown in synthetic_pages(shape)]
+    size = sum(len(markdown) for markdown in pages)
+    return [measure("parse", markdown_to_html_node, pages, size, repeat)]
+
+
+def bench_serialize(shape, repeat):
+    nodes = [markdown_to_html_node(markdown) for _, markdown in synthetic_pages(shape)]
+    size = sum(len(node.to_html()) for node in nodes)
+    return [measure("serialize", lambda node: node.to_html(), nodes, size, repeat)]
+
+
+def bench_inline(shape, repeat):
+    paragraphs = []
+    for _, markdown in synthetic_pages(shape):
+        for block in markdown_to_blocks(markdown):
+            if not block.startswith(("#", "-", ">", "`")) and not block[0].isdigit():
+                paragraphs.append(block.replace("\n", " "))
+    for paragraph in paragraphs[:200]:
+        if text_to_textnodes(paragraph) != chained_text_to_textnodes(paragraph):
+            raise Exception("single-pass scanner and chained pipeline disagree")
+    size = sum(len(p) for p in paragraphs)
+    return [
+        measure("inline", text_to_textnodes, paragraphs, size, repeat),
+        measure("inline-chained", chained_text_to_textnodes, paragraphs, size, repeat),
+    ]
+
+
+def bench_build(shape, repeat, build_args=()):
+    with tempfile.TemporaryDirectory() as root:
+        size = generate_corpus(root, shape)
+        command = [sys.executable, os.path.join(SRC_DIR, "main.py"), *build_args]
+        best = None
+        for _ in range(repeat):
+            shutil.rmtree(os.path.join(root, "docs"), ignore_errors=True)
+            shutil.rmtree(os.path.join(root, ".cache"), ignore_errors=True)
+            start = time.perf_counter()
+            subprocess.run(command, cwd=root, check=True, stdout=subprocess.DEVNULL)
+            elapsed = time.perf_counter() - start
+            if best is None or elapsed < best:
+                best = elapsed
+    return [
+        {
+            "name": " ".join(["build", *build_args]),
+            "seconds": best,
+            "items_per_sec": shape.pages / best,
+            "mb_per_sec": size / best / 1e6,
+            # the largest of any build subprocess this run has started
+            "peak_mb": peak_rss_mb(resource.RUSAGE_CHILDREN),
+        }
+    ]
+
+
+def without_slots(cls):
+    # a subclass that does not declare __slots__ gets a per-instance
+    # __dict__ again, which is what every node looked like before
+    return type(f"Dict{cls.__name__}", (cls,), {})
+
+
+def bytes_per_node(make, count):
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    nodes = [make(i) for i in range(count)]
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    size = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+    # the list holding the nodes is not part of their cost
+    size -= sys.getsizeof(nodes)
+    return size / count
+
+
+def peak_rss_mb(who=resource.RUSAGE_SELF):
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    peak = resource.getrusage(who).ru_maxrss
+    if sys.platform == "darwin":
+        return peak / 1e6
+    return peak / 1e3
+
+
+def use_dict_nodes():
+    # swaps every node class for its dict-backed subclass in the modules
+    # that build nodes, so a whole render runs the way it did before
+    replaced = {}
+    for module in (htmlnode, textnode, inline_markdown, markdown_blocks):
+        for name in ("TextNode", "LeafNode", "RawNode", "ParentNode"):
+            cls = getattr(module, name, None)
+            if cls is not None:
+                if name not in replaced:
+                    replaced[name] = without_slots(cls)
+                setattr(module, name, replaced[name])
+
+
+def render_memory(markdown_path, slots=True):
+    # run in a fresh interpreter by bench_memory, so the peak RSS it
+    # prints is the render's and nothing else's
+    if not slots:
+        use_dict_nodes()
+    with open(markdown_path) as f:
+        markdown = f.read()
+    start = time.perf_counter()
+    html = markdown_to_html_node(markdown).to_html()
+    elapsed = time.perf_counter() - start
+    print(json.dumps({"seconds": elapsed, "html_size": len(html), "peak_mb": peak_rss_mb()}))
+
+
+def bench_memory(shape, repeat, count=100000):
+    # one very large page, rendered in a new process with __slots__ nodes
+    # and again with dict-backed ones, comparing the two peak RSS figures
+    big = CorpusShape(1, 0, shape.blocks * 500, shape.inline_density, shape.images, shape.mix)
+    markdown = synthetic_page(random.Random(shape.seed), big, 0)
+    runs = {}
+    with tempfile.TemporaryDirectory() as root:
+        markdown_path = os.path.join(root, "big.md")
+        with open(markdown_path, "w") as f:
+            f.write(markdown)
+        for slots in (True, False):
+            code = f"import bench; bench.render_memory({markdown_path!r}, {slots})"
+            result = subprocess.run(
+                [sys.executable, "-c", code],
+                cwd=SRC_DIR,
+                check=True,
+                capture_output=True,
+                text=True,
+            )
+            runs[slots] = json.loads(result.stdout)
+    slotted, dict_backed = runs[True], runs[False]
+    saved = 1 - slotted["peak_mb"] / dict_backed["peak_mb"]
+    print(
+        f"  render {len(markdown) / 1e6:.2f} MB markdown -> "
+        f"{slotted['html_size'] / 1e6:.2f} MB html, "
+        f"peak RSS {slotted['peak_mb']:.1f} MB with __slots__, "
+        f"{dict_backed['peak_mb']:.1f} MB with __dict__ ({saved * 100:.1f}% less)"
+    )
+
+    # every node shares the same strings and children list, so only the
+    # node objects themselves are counted
+    children = []
+    factories = {
+        "TextNode": lambda cls: lambda i: cls("text", TextType.TEXT, None),
+        "HTMLNode": lambda cls: lambda i: cls("p", "text", None, None),
+        "LeafNode": lambda cls: lambda i: cls("b", "text"),
+        "ParentNode": lambda cls: lambda i: cls("p", children),
+    }
+    for cls in (TextNode, HTMLNode, LeafNode, ParentNode):
+        factory = factories[cls.__name__]
+        before = bytes_per_node(factory(without_slots(cls)), count)
+        after = bytes_per_node(factory(cls), count)
+        print(
+            f"  {cls.__name__:<12} {before:6.1f} B/node with __dict__  "
+            f"{after:6.1f} B/node with __slots__"
+        )
+    return [
+        {
+            "name": name,
+            "seconds": run["seconds"],
+            "items_per_sec": 1 / run["seconds"],
+            "mb_per_sec": len(markdown) / run["seconds"] / 1e6,
+            "peak_mb": run["peak_mb"],
+        }
+        for name, run in (("memory", slotted), ("memory-dict", dict_backed))
+    ]
+
+
+def bench_escape(shape, repeat):
+    # one large page serialized with escaping switched off, as it is, and
+    # with its text full of characters that need escaping
+    big = CorpusShape(1, 0, shape.blocks * 50, shape.inline_density, shape.images, shape.mix)
+    markdown = synthetic_page(random.Random(shape.seed), big, 0)
+    dense = markdown.replace("o", "<").replace("a", "&")
+    node = markdown_to_html_node(markdown)
+    dense_node = markdown_to_html_node(dense)
+    serialize = lambda node: node.to_html()
+
+    escape_text, escape_attribute = htmlnode.escape_text, htmlnode.escape_attribute
+    htmlnode.escape_text = htmlnode.escape_attribute = str
+    try:
+        off = measure("escape-off", serialize, [node], len(node.to_html()), repeat)
+    finally:
+        htmlnode.escape_text, htmlnode.escape_attribute = escape_text, escape_attribute
+    results = [
+        off,
+        measure("escape", serialize, [node], len(node.to_html()), repeat),
+        measure("escape-dense", serialize, [dense_node], len(dense_node.to_html()), repeat),
+    ]
+    for result in results[1:]:
+        overhead = result["seconds"] / off["seconds"] - 1
+        print(f"  {result['name']}: {overhead * 100:+.1f}% over serializing without escaping")
+    return results
+
+
+BENCHMARKS = {
+    "parse": bench_parse,
+    "serialize": bench_serialize,
+    "inline": bench_inline,
+    "build": bench_build,
+    "memory": bench_memory,
+    "escape": bench_escape,
+}
+
+
+def git_commit():
+    try:
+        result = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=REPO_DIR,
+            capture_output=True,
+            text=True,
+        )
+    except OSError:
+        return None
+    return result.stdout.strip() or None
+
+
+def load_results(path):
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def previous_result(history, result):
+    for old in reversed(history):
+        if old["name"] == result["name"] and old["shape"] == result["shape"]:
+            return old
+    return None
+
+
+def format_result(result, previous):
+    line = (
+        f"  {result['name']:<16} {result['seconds'] * 1000:9.1f} ms "
+        f"{result['items_per_sec']:10.1f}/s {result['mb_per_sec']:7.2f} MB/s "
+        f"peak {result['peak_mb']:7.1f} MB"
+    )
+    if previous is None or not previous["seconds"]:
+        return line
+    change = result["seconds"] / previous["seconds"] - 1
+    line += f"  {change * 100:+6.1f}% vs {previous.get('commit') or 'last run'}"
+    if change > REGRESSION_THRESHOLD:
+        line += "  REGRESSION"
+    return line
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(","):
+        kind, _, weight = part.partition("=")
+        if kind not in DEFAULT_MIX:
+            raise argparse.ArgumentTypeError(f"unknown block kind: {kind}")
+        mix[kind] = float(weight or 1)
+    return mix
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Benchmark the generator on a synthetic corpus")
+    parser.add_argument(
+        "benchmarks",
+        nargs="*",
+        metavar="BENCHMARK",
+        help=f"any of {', '.join(BENCHMARKS)} (default: all)",
+    )
+    parser.add_argument("--pages", type=int, default=200)
+    parser.add_argument("--depth", type=int, default=2, help="directory levels above each page")
+    parser.add_argument("--blocks", type=int, default=40, help="blocks per page")
+    parser.add_argument("--inline-density", type=float, default=0.3)
+    parser.add_argument("--images", type=int, default=1, help="images per page")
+    parser.add_argument("--mix", type=parse_mix, help="block weights, e.g. paragraph=5,code=2")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--build-args", default="", help="extra arguments for the build benchmark")
+    parser.add_argument("--results", default=RESULTS_PATH, help="history file runs are appended to")
+    parser.add_argument("--no-save", action="store_true", help="do not record this run")
+    args = parser.parse_args(argv)
+    for name in args.benchmarks:
+        if name not in BENCHMARKS:
+            parser.error(f"unknown benchmark: {name}")
+    return args
+
+
+def main():
+    args = parse_args(sys.argv[1:])
+    shape = CorpusShape(
+        args.pages,
+        args.depth,
+        args.blocks,
+        args.inline_density,
+        args.images,
+        args.mix,
+        args.seed,
+    )
+    history = load_results(args.results)
+    commit = git_commit()
+    results = []
+    for name in args.benchmarks or list(BENCHMARKS):
+        print(f"{name}:")
+        if name == "build":
+            found = bench_build(shape, args.repeat, args.build_args.split())
+        else:
+            found = BENCHMARKS[name](shape, args.repeat)
+        for result in found:
+            result["shape"] = shape.to_json()
+            result["commit"] = commit
+            result["time"] = time.strftime("%Y-%m-%dT%H:%M:%S")
+            print(format_result(result, previous_result(history, result)))
+            results.append(result)
+
+    if args.no_save:
+        return
+    dirname = os.path.dirname(args.results)
+    if dirname and not os.path.exists(dirname):
+        os.makedirs(dirname)
+    with open(args.results, "a") as f:
+        for result in results:
+            f.write(json.dumps(result, sort_keys=True) + "\n")
+    print(f"Appended {len(results)} results to {args.results}")
+
+
+if __name__ == "__main__":
+    main()
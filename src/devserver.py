@@ -0,0 +1,306 @@
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import threading
+import time
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+LIVE_RELOAD_PATH = "/__livereload"
+LIVE_RELOAD_SCRIPT = (
+    "<script>"
+    f'new EventSource("{LIVE_RELOAD_PATH}").onmessage = () => location.reload();'
+    "</script>"
+)
+
+# inotify(7) event masks
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+EVENT_HEADER = struct.Struct("iIII")
+
+# how long to keep collecting events after the first one, so a save that
+# touches a file several times turns into a single rebuild
+SETTLE_SECONDS = 0.02
+
+
+def is_ignored(path):
+    # hidden files, and the swap, backup and lock files editors write next
+    # to the file being edited (4913 is vim checking it may write there)
+    name = os.path.basename(path)
+    return (
+        name.startswith(".")
+        or name.endswith("~")
+        or (len(name) > 1 and name.startswith("#") and name.endswith("#"))
+        or name == "4913"
+    )
+
+
+def make_watcher(dirs, files, poll_interval=0.25):
+    if sys.platform.startswith("linux"):
+        try:
+            return InotifyWatcher(dirs, files)
+        except OSError as e:
+            print(f"inotify unavailable ({e}), polling for changes instead")
+    return PollingWatcher(dirs, files, poll_interval)
+
+
+class InotifyWatcher:
+    def __init__(self, dirs, files):
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self._add_watch = libc.inotify_add_watch
+        self._add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), os.strerror(ctypes.get_errno()))
+        self.dirs = {}
+        self.recursive = {os.path.normpath(path) for path in dirs}
+        # single files are watched through their directory, because editors
+        # often save by writing a new file and renaming it over the old one
+        self.files = {os.path.normpath(path) for path in files}
+        for path in self.recursive:
+            self._watch_tree(path)
+        for path in self.files:
+            self._watch_dir(os.path.dirname(path) or ".")
+
+    def _watch_dir(self, path):
+        wd = self._add_watch(self.fd, os.fsencode(path), WATCH_MASK)
+        if wd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, f"{os.strerror(errno)}: {path}")
+        self.dirs[wd] = os.path.normpath(path)
+
+    def _watch_tree(self, path):
+        self._watch_dir(path)
+        for root, subdirs, _ in os.walk(path):
+            subdirs[:] = [subdir for subdir in subdirs if not is_ignored(subdir)]
+            for subdir in subdirs:
+                self._watch_dir(os.path.join(root, subdir))
+
+    def _is_watched(self, path):
+        if path in self.files:
+            return True
+        return any(path == root or path.startswith(root + os.sep) for root in self.recursive)
+
+    def wait(self, timeout=None):
+        changed = set()
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return changed
+        deadline = time.monotonic() + SETTLE_SECONDS
+        while True:
+            self._read_events(changed)
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            readable, _, _ = select.select([self.fd], [], [], remaining)
+            if not readable:
+                break
+        return changed
+
+    def _read_events(self, changed):
+        try:
+            data = os.read(self.fd, 1 << 16)
+        except BlockingIOError:
+            return
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = data[offset : offset + length].rstrip(b"\0")
+            offset += length
+
+            if mask & IN_Q_OVERFLOW:
+                # events were dropped; report every watched root so the
+                # caller rebuilds conservatively
+                changed.update(self.recursive)
+                changed.update(self.files)
+                continue
+            if mask & IN_IGNORED:
+                self.dirs.pop(wd, None)
+                continue
+            parent = self.dirs.get(wd)
+            if parent is None or not name:
+                continue
+            path = os.path.normpath(os.path.join(parent, os.fsdecode(name)))
+            if not self._is_watched(path) or is_ignored(path):
+                continue
+            changed.add(path)
+            if mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO):
+                # a new directory may already hold files by the time it is
+                # being watched, so report those too
+                self._watch_tree(path)
+                for root, subdirs, filenames in os.walk(path):
+                    subdirs[:] = [subdir for subdir in subdirs if not is_ignored(subdir)]
+                    changed.update(
+                        os.path.join(root, filename)
+                        for filename in filenames
+                        if not is_ignored(filename)
+                    )
+
+    def close(self):
+        os.close(self.fd)
+
+
+class PollingWatcher:
+    def __init__(self, dirs, files, interval=0.25):
+        self.dirs = list(dirs)
+        self.files = list(files)
+        self.interval = interval
+        self.snapshot = self._scan()
+
+    def _scan(self):
+        snapshot = {}
+        paths = list(self.files)
+        for path in self.dirs:
+            for root, subdirs, filenames in os.walk(path):
+                subdirs[:] = [subdir for subdir in subdirs if not is_ignored(subdir)]
+                paths.extend(
+                    os.path.join(root, filename)
+                    for filename in filenames
+                    if not is_ignored(filename)
+                )
+        for path in paths:
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            snapshot[os.path.normpath(path)] = (st.st_mtime_ns, st.st_size)
+        return snapshot
+
+    def wait(self, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            time.sleep(self.interval)
+            snapshot = self._scan()
+            changed = {
+                path
+                for path in snapshot.keys() | self.snapshot.keys()
+                if snapshot.get(path) != self.snapshot.get(path)
+            }
+            self.snapshot = snapshot
+            if changed or (deadline is not None and time.monotonic() >= deadline):
+                return changed
+
+    def close(self):
+        pass
+
+
+class LiveReloadHandler(SimpleHTTPRequestHandler):
+    def __init__(self, *args, server_state, **kwargs):
+        self.server_state = server_state
+        super().__init__(*args, **kwargs)
+
+    def log_message(self, format, *args):
+        pass
+
+    def translate_path(self, path):
+        # the site is built for basepath, so strip it before mapping the
+        # request onto docs/
+        basepath = self.server_state.basepath
+        if basepath != "/" and path.startswith(basepath):
+            path = "/" + path[len(basepath) :]
+        return super().translate_path(path)
+
+    def do_GET(self):
+        if self.path == LIVE_RELOAD_PATH:
+            self._stream_reloads()
+            return
+        path = self.translate_path(self.path)
+        if os.path.isdir(path):
+            if not self.path.split("?", 1)[0].endswith("/"):
+                # let the base handler redirect to the trailing-slash url
+                super().do_GET()
+                return
+            path = os.path.join(path, "index.html")
+        if path.endswith(".html") and os.path.isfile(path):
+            self._send_html(path)
+            return
+        super().do_GET()
+
+    def _send_html(self, path):
+        with open(path, "rb") as f:
+            body = f.read()
+        script = LIVE_RELOAD_SCRIPT.encode()
+        index = body.rfind(b"</body>")
+        if index == -1:
+            body += script
+        else:
+            body = body[:index] + script + body[index:]
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Cache-Control", "no-store")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _stream_reloads(self):
+        # taken before the headers go out, so a reload right after the
+        # client sees them is not missed
+        state = self.server_state
+        seen = state.version
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-store")
+        self.end_headers()
+        try:
+            while not state.stopping:
+                with state.changed:
+                    state.changed.wait_for(
+                        lambda: state.version != seen or state.stopping, timeout=15
+                    )
+                    version = state.version
+                if version != seen:
+                    seen = version
+                    self.wfile.write(b"data: reload\n\n")
+                else:
+                    # keeps proxies and the browser from dropping the stream
+                    self.wfile.write(b": ping\n\n")
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+
+class DevServer:
+    def __init__(self, root, basepath="/", host="0.0.0.0", port=8888):
+        self.root = root
+        self.basepath = basepath
+        self.version = 0
+        self.stopping = False
+        self.changed = threading.Condition()
+        handler = partial(LiveReloadHandler, directory=root, server_state=self)
+        self.httpd = ThreadingHTTPServer((host, port), handler)
+        self.httpd.daemon_threads = True
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        if host in ("0.0.0.0", "::"):
+            host = "localhost"
+        return f"http://{host}:{port}{self.basepath}"
+
+    def start(self):
+        self.thread.start()
+
+    def notify_reload(self):
+        with self.changed:
+            self.version += 1
+            self.changed.notify_all()
+
+    def stop(self):
+        with self.changed:
+            self.stopping = True
+            self.changed.notify_all()
+        self.httpd.shutdown()
+        self.httpd.server_close()
@@ -0,0 +1,57 @@
+import re
+import time
+from itertools import chain
+
+FENCE = "---"
+KEY_PATTERN = re.compile(r"[A-Za-z_]\w*")
+DATE_FORMAT = "%Y-%m-%d"
+
+
+def split_front_matter(lines):
+    # reads a "key: value" header between two --- lines off the front of
+    # lines, returning it and an iterator over the rest of the document
+    lines = iter(lines)
+    first = next(lines, None)
+    if first is None:
+        return {}, iter(())
+    if first.rstrip() != FENCE:
+        return {}, chain([first], lines)
+    front_matter = {}
+    for line in lines:
+        if line.rstrip() == FENCE:
+            return front_matter, lines
+        if not line.strip() or line.lstrip().startswith("#"):
+            continue
+        key, sep, value = line.partition(":")
+        key = key.strip()
+        if not sep or not KEY_PATTERN.fullmatch(key):
+            raise ValueError(f"invalid front matter line: {line}")
+        front_matter[key] = parse_value(key, value.strip())
+    raise ValueError("invalid front matter: no closing ---")
+
+
+def parse_value(key, text):
+    if len(text) >= 2 and text[0] == text[-1] and text[0] in "\"'":
+        # quoted values are plain strings, but a date is still checked
+        text = text[1:-1]
+    elif text.startswith("[") and text.endswith("]"):
+        return [item.strip().strip("\"'") for item in text[1:-1].split(",") if item.strip()]
+    elif key == "tags":
+        return [item.strip() for item in text.split(",") if item.strip()]
+    if key == "date":
+        try:
+            time.strptime(text, DATE_FORMAT)
+        except ValueError:
+            raise ValueError(f"invalid front matter date: {text}") from None
+    return text
+
+
+def template_values(front_matter):
+    # front matter keys become template slots, so {{ description }} in the
+    # template picks up "description: ..." from the page
+    values = {}
+    for key, value in front_matter.items():
+        if isinstance(value, list):
+            value = ", ".join(value)
+        values[key] = value
+    return values
@@ -0,0 +1,119 @@
+import hashlib
+import os
+import re
+
+try:
+    import pygments
+except ImportError:
+    pygments = None
+
+HIGHLIGHT_STYLE = "default"
+# the language names a cache directory, so it may not be "." or ".."
+LANGUAGE_PATTERN = re.compile(r"\w[\w+#.-]*")
+
+_enabled = pygments is not None
+_cache = None
+
+
+def highlighter_version():
+    # part of every cache key and page entry, so upgrading pygments or
+    # switching styles re-highlights everything
+    if not _enabled:
+        return "off"
+    return f"pygments-{pygments.__version__}-{HIGHLIGHT_STYLE}"
+
+
+def configure(enabled=True, cache_dir=None):
+    global _enabled, _cache
+    _enabled = enabled and pygments is not None
+    _cache = HighlightCache(cache_dir) if _enabled and cache_dir else None
+    return _cache
+
+
+def settings():
+    return _enabled, _cache.cache_dir if _cache is not None else None
+
+
+def cache():
+    return _cache
+
+
+def fence_language(line):
+    info = line[3:].strip()
+    if not info:
+        return None
+    lang = info.split()[0].lower()
+    if not LANGUAGE_PATTERN.fullmatch(lang):
+        return None
+    return lang
+
+
+def highlight_code(code, lang):
+    # returns the highlighted html for the inside of <code>, or None when
+    # the block should stay plain text
+    if not _enabled or lang is None:
+        return None
+    if _cache is not None:
+        return _cache.get(code, lang)
+    return tokenize(code, lang)
+
+
+def tokenize(code, lang):
+    from pygments import highlight
+    from pygments.formatters import HtmlFormatter
+    from pygments.lexers import get_lexer_by_name
+    from pygments.util import ClassNotFound
+
+    try:
+        # stripnl would drop leading and trailing blank lines of the sample
+        lexer = get_lexer_by_name(lang, stripnl=False)
+    except ClassNotFound:
+        return None
+    # inline styles keep highlighted pages working without a stylesheet
+    formatter = HtmlFormatter(nowrap=True, noclasses=True, style=HIGHLIGHT_STYLE)
+    return highlight(code, lexer, formatter)
+
+
+class HighlightCache:
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+        self.hits = 0
+        self.misses = 0
+
+    def path(self, code, lang):
+        digest = hashlib.sha256(code.encode()).hexdigest()
+        return os.path.join(self.cache_dir, highlighter_version(), lang, digest + ".html")
+
+    def get(self, code, lang):
+        path = self.path(code, lang)
+        try:
+            with open(path) as f:
+                html = f.read()
+        except FileNotFoundError:
+            pass
+        else:
+            self.hits += 1
+            # an empty entry records a language pygments does not know,
+            # which is as slow to find out as highlighting
+            return html or None
+        self.misses += 1
+        html = tokenize(code, lang)
+        self.put(path, html or "")
+        return html
+
+    def put(self, path, html):
+        # worker processes may write the same entry at once; each writes its
+        # own temporary file and the rename makes the last one win
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(html)
+        os.replace(tmp_path, path)
+
+    def stats_line(self):
+        lookups = self.hits + self.misses
+        rate = self.hits / lookups * 100 if lookups else 0.0
+        return f"Highlight cache: {self.hits} hits, {self.misses} misses ({rate:.1f}% hit rate)"
+
+    def __repr__(self):
+        return f"HighlightCache({self.cache_dir}, hits: {self.hits}, misses: {self.misses})"
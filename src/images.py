@@ -0,0 +1,271 @@
+import hashlib
+import json
+import os
+import struct
+from concurrent.futures import ProcessPoolExecutor
+
+from assets import asset_url
+from manifest import hash_file
+from static_sync import copy_file
+
+try:
+    import PIL
+    from PIL import Image
+except ImportError:
+    PIL = None
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".gif")
+VARIANT_WIDTHS = (480, 960, 1600)
+VARIANT_FORMAT = "webp"
+VARIANT_QUALITY = 80
+
+_enabled = PIL is not None
+_cache = None
+_table = {}
+
+
+def encoder_version():
+    # part of every cache key and image entry, so upgrading pillow or
+    # changing the format or quality re-encodes everything
+    if not _enabled:
+        return "off"
+    return f"pillow-{PIL.__version__}-{VARIANT_FORMAT}-q{VARIANT_QUALITY}"
+
+
+def configure(enabled=True, cache_dir=None):
+    global _enabled, _cache
+    _enabled = enabled and PIL is not None
+    _cache = ImageCache(cache_dir) if cache_dir else None
+    return _cache
+
+
+def cache():
+    return _cache
+
+
+def table():
+    return _table
+
+
+def set_table(images):
+    global _table
+    _table = images
+
+
+def table_version():
+    # pages embed sizes and variants, so they are rebuilt when this changes
+    data = json.dumps(_table, sort_keys=True).encode()
+    return hashlib.sha256(data).hexdigest()[:16]
+
+
+def image_attributes(url):
+    # extra <img> attributes for an image the asset stage knows about;
+    # anything else (remote urls, missing files) gets none
+    image = _table.get(url)
+    if image is None:
+        return {}
+    attributes = {"width": str(image["width"]), "height": str(image["height"])}
+    if image["variants"]:
+        attributes["srcset"] = ", ".join(
+            f"{asset_url(variant['url'])} {variant['width']}w" for variant in image["variants"]
+        )
+    return attributes
+
+
+def image_size(path):
+    # reads (width, height) from the file header, so sizes are known
+    # without pillow; returns None for anything it does not recognize
+    with open(path, "rb") as f:
+        head = f.read(26)
+        if head.startswith(b"\x89PNG\r\n\x1a\n") and head[12:16] == b"IHDR":
+            return struct.unpack(">II", head[16:24])
+        if head[:6] in (b"GIF87a", b"GIF89a"):
+            return struct.unpack("<HH", head[6:10])
+        if head.startswith(b"\xff\xd8"):
+            f.seek(2)
+            return jpeg_size(f)
+    return None
+
+
+def jpeg_size(f):
+    while True:
+        marker = f.read(2)
+        if len(marker) < 2 or marker[0] != 0xFF:
+            return None
+        if marker[1] == 0xFF:
+            # padding before a marker
+            f.seek(-1, os.SEEK_CUR)
+            continue
+        length = f.read(2)
+        if len(length) < 2:
+            return None
+        # start of frame markers, except DHT, JPG and DAC
+        if 0xC0 <= marker[1] <= 0xCF and marker[1] not in (0xC4, 0xC8, 0xCC):
+            frame = f.read(5)
+            if len(frame) < 5:
+                return None
+            height, width = struct.unpack(">HH", frame[1:5])
+            return width, height
+        f.seek(struct.unpack(">H", length)[0] - 2, os.SEEK_CUR)
+
+
+def collect_images(src_dir, dest_dir, url="/"):
+    images = []
+    for item in sorted(os.listdir(src_dir)):
+        src_path = os.path.join(src_dir, item)
+        dest_path = os.path.join(dest_dir, item)
+        if os.path.isdir(src_path):
+            images.extend(collect_images(src_path, dest_path, url + item + "/"))
+        elif item.lower().endswith(IMAGE_EXTENSIONS):
+            images.append((src_path, dest_path, url + item))
+    return images
+
+
+def variant_widths(width):
+    # smaller sizes for narrow screens, plus the original size re-encoded
+    return [w for w in VARIANT_WIDTHS if w < width] + [width]
+
+
+def image_entry(src_path, dest_path, url, st):
+    size = image_size(src_path)
+    if size is None:
+        return None
+    width, height = size
+    entry = {
+        "size": st.st_size,
+        "mtime_ns": st.st_mtime_ns,
+        "hash": hash_file(src_path),
+        "encoder": encoder_version(),
+        "url": url,
+        "width": width,
+        "height": height,
+        "variants": [],
+    }
+    if _enabled:
+        stem, _ = os.path.splitext(dest_path)
+        url_stem, _ = os.path.splitext(url)
+        for w in variant_widths(width):
+            entry["variants"].append(
+                {
+                    "width": w,
+                    "height": max(1, round(height * w / width)),
+                    "dest": f"{stem}-{w}w.{VARIANT_FORMAT}",
+                    "url": f"{url_stem}-{w}w.{VARIANT_FORMAT}",
+                }
+            )
+    return entry
+
+
+def optimize_images(src_dir, dest_dir, manifest, jobs=1):
+    # sizes every image under src_dir and, with pillow, writes resized
+    # variants next to the copied original; encodes come from the cache
+    # unless the source bytes or the encoder changed
+    images = {}
+    entries = {}
+    missing = []
+    for src_path, dest_path, url in collect_images(src_dir, dest_dir):
+        st = os.stat(src_path)
+        entry = manifest.images.get(src_path)
+        fresh = (
+            entry is not None
+            and entry["size"] == st.st_size
+            and entry["mtime_ns"] == st.st_mtime_ns
+            and entry["encoder"] == encoder_version()
+            and entry["url"] == url
+        )
+        if not fresh:
+            entry = image_entry(src_path, dest_path, url, st)
+            if entry is None:
+                continue
+        entries[src_path] = entry
+        images[url] = {
+            "width": entry["width"],
+            "height": entry["height"],
+            "variants": [
+                {"url": variant["url"], "width": variant["width"]} for variant in entry["variants"]
+            ],
+        }
+        for variant in entry["variants"]:
+            if not fresh or not os.path.exists(variant["dest"]):
+                missing.append((src_path, entry["hash"], variant))
+
+    encoded = 0
+    if missing:
+        if _cache is None:
+            raise ValueError("invalid image settings: variants need a cache directory")
+        encodes = {}
+        for src_path, digest, variant in missing:
+            cache_path = _cache.path(digest, variant["width"])
+            if os.path.exists(cache_path):
+                _cache.hits += 1
+            elif cache_path not in encodes:
+                _cache.misses += 1
+                encodes[cache_path] = (src_path, cache_path, variant["width"], variant["height"])
+        encode_variants(list(encodes.values()), jobs)
+        encoded = len(encodes)
+        for src_path, digest, variant in missing:
+            dirname = os.path.dirname(variant["dest"])
+            if dirname:
+                os.makedirs(dirname, exist_ok=True)
+            copy_file(_cache.path(digest, variant["width"]), variant["dest"])
+
+    old_variants = {v["dest"] for entry in manifest.images.values() for v in entry["variants"]}
+    new_variants = {v["dest"] for entry in entries.values() for v in entry["variants"]}
+    removed = sorted(old_variants - new_variants)
+    for path in removed:
+        if os.path.isfile(path):
+            print(f"Removing stale image variant {path}")
+            os.remove(path)
+    manifest.images = entries
+    set_table(images)
+
+    variants = len(new_variants)
+    print(
+        f"Optimized images: {len(images)} sized, {variants} variants "
+        f"({encoded} encoded, {len(missing) - encoded} from cache), {len(removed)} removed"
+    )
+    return images
+
+
+def encode_variants(encodes, jobs=1):
+    # encoding is cpu bound and every variant is independent
+    if jobs <= 1 or len(encodes) <= 1:
+        for encode in encodes:
+            encode_variant(*encode)
+        return
+    with ProcessPoolExecutor(max_workers=min(jobs, len(encodes))) as executor:
+        for _ in executor.map(encode_variant, *zip(*encodes)):
+            pass
+
+
+def encode_variant(src_path, cache_path, width, height):
+    with Image.open(src_path) as image:
+        if image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA")
+        if image.size != (width, height):
+            image = image.resize((width, height), Image.LANCZOS)
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+        image.save(tmp_path, VARIANT_FORMAT.upper(), quality=VARIANT_QUALITY)
+    os.replace(tmp_path, cache_path)
+
+
+class ImageCache:
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+        self.hits = 0
+        self.misses = 0
+
+    def path(self, digest, width):
+        # keyed by the source's content hash and the transform, so a renamed
+        # or copied image is never encoded twice
+        name = f"{digest}-{width}w.{VARIANT_FORMAT}"
+        return os.path.join(self.cache_dir, encoder_version(), digest[:2], name)
+
+    def stats_line(self):
+        lookups = self.hits + self.misses
+        rate = self.hits / lookups * 100 if lookups else 0.0
+        return f"Image cache: {self.hits} hits, {self.misses} misses ({rate:.1f}% hit rate)"
+
+    def __repr__(self):
+        return f"ImageCache({self.cache_dir}, hits: {self.hits}, misses: {self.misses})"
@@ -3,13 +3,163 @@ import re
 from textnode import TextNode, TextType
 
 
+IMAGE_PATTERN = re.compile(r"!\[([^\[\]]*)\]\(([^\(\)]*)\)")
+LINK_PATTERN = re.compile(r"(?<!!)\[([^\[\]]*)\]\(([^\(\)]*)\)")
+
+
+class InlineSyntax:
+    def __init__(self, name, start, pattern, to_node, unclosed_error=None):
+        self.name = name
+        # the literal text the construct begins with, used to find candidates
+        self.start = start
+        # matched at the start position; compiled once, here
+        self.pattern = re.compile(pattern, re.DOTALL) if isinstance(pattern, str) else pattern
+        # turns a match into a TextNode, or None to drop an empty construct
+        self.to_node = to_node
+        # if set, a start that the pattern does not match is an error
+        # instead of plain text
+        self.unclosed_error = unclosed_error
+
+    def __repr__(self):
+        return f"InlineSyntax({self.name}, {self.start}, {self.pattern.pattern})"
+
+
+INLINE_SYNTAXES = []
+_inline_start_pattern = None
+_inline_start_syntaxes = []
+
+
+def register_inline_syntax(syntax):
+    if any(existing.name == syntax.name for existing in INLINE_SYNTAXES):
+        raise ValueError(f"inline syntax already registered: {syntax.name}")
+    INLINE_SYNTAXES.append(syntax)
+    _compile_inline_syntaxes()
+
+
+def unregister_inline_syntax(name):
+    INLINE_SYNTAXES[:] = [syntax for syntax in INLINE_SYNTAXES if syntax.name != name]
+    _compile_inline_syntaxes()
+
+
+def _compile_inline_syntaxes():
+    # one alternation over every start string, longest first so "![" wins
+    # over "[" at the same position; lastindex of a match picks the group
+    global _inline_start_pattern, _inline_start_syntaxes
+    starts = []
+    for syntax in INLINE_SYNTAXES:
+        if syntax.start not in starts:
+            starts.append(syntax.start)
+    starts.sort(key=len, reverse=True)
+    _inline_start_syntaxes = [
+        tuple(
+            (syntax.pattern.match, syntax.to_node, syntax.unclosed_error)
+            for syntax in INLINE_SYNTAXES
+            if syntax.start == start
+        )
+        for start in starts
+    ]
+    if not starts:
+        _inline_start_pattern = re.compile("(?!)")
+        return
+    # the leading character class lets the engine skip ahead quickly; a bare
+    # alternation of groups is tried at every position
+    first_chars = "".join(sorted({re.escape(start[0]) for start in starts}))
+    alternatives = "|".join(f"({re.escape(start)})" for start in starts)
+    _inline_start_pattern = re.compile(f"(?=[{first_chars}])(?:{alternatives})")
+
+
+def delimited_pattern(delimiter):
+    # matches up to the first closing delimiter, like a lazy .*? would, but
+    # as an unrolled loop that the regex engine runs much faster
+    first = re.escape(delimiter[0])
+    escaped = re.escape(delimiter)
+    if len(delimiter) == 1:
+        return f"{escaped}([^{first}]*){escaped}"
+    rest = re.escape(delimiter[1:])
+    return f"{escaped}([^{first}]*(?:{first}(?!{rest})[^{first}]*)*){escaped}"
+
+
+def _delimited_node(text_type):
+    def to_node(match):
+        text = match.group(1)
+        if text == "":
+            return None
+        return TextNode(text, text_type)
+
+    return to_node
+
+
+def _url_node(text_type):
+    def to_node(match):
+        return TextNode(match.group(1), text_type, match.group(2))
+
+    return to_node
+
+
+for _syntax in (
+    InlineSyntax(
+        "bold",
+        "**",
+        delimited_pattern("**"),
+        _delimited_node(TextType.BOLD),
+        "invalid markdown, formatted section not closed",
+    ),
+    InlineSyntax(
+        "italic",
+        "_",
+        delimited_pattern("_"),
+        _delimited_node(TextType.ITALIC),
+        "invalid markdown, formatted section not closed",
+    ),
+    InlineSyntax(
+        "code",
+        "`",
+        delimited_pattern("`"),
+        _delimited_node(TextType.CODE),
+        "invalid markdown, formatted section not closed",
+    ),
+    InlineSyntax("image", "![", IMAGE_PATTERN, _url_node(TextType.IMAGE)),
+    InlineSyntax("link", "[", LINK_PATTERN, _url_node(TextType.LINK)),
+):
+    register_inline_syntax(_syntax)
+
+
 def text_to_textnodes(text):
-    nodes = [TextNode(text, TextType.TEXT)]
-    nodes = split_nodes_delimiter(nodes, "**", TextType.BOLD)
-    nodes = split_nodes_delimiter(nodes, "_", TextType.ITALIC)
-    nodes = split_nodes_delimiter(nodes, "`", TextType.CODE)
-    nodes = split_nodes_image(nodes)
-    nodes = split_nodes_link(nodes)
+    # one left-to-right scan: find the next place an inline construct could
+    # start, consume it whole, and emit the plain text in between
+    nodes = []
+    text_start = 0
+    search_from = 0
+    start_pattern = _inline_start_pattern
+    start_syntaxes = _inline_start_syntaxes
+    while True:
+        start_match = start_pattern.search(text, search_from)
+        if start_match is None:
+            break
+        start = start_match.start()
+
+        candidates = start_syntaxes[start_match.lastindex - 1]
+        for match_at, to_node, _ in candidates:
+            match = match_at(text, start)
+            if match is not None:
+                break
+        else:
+            for _, _, unclosed_error in candidates:
+                if unclosed_error is not None:
+                    raise ValueError(unclosed_error)
+            # a start that opens nothing is plain text
+            search_from = start_match.end()
+            continue
+
+        if start > text_start:
+            nodes.append(TextNode(text[text_start:start], TextType.TEXT))
+        node = to_node(match)
+        if node is not None:
+            nodes.append(node)
+        text_start = search_from = match.end()
+
+    if text_start < len(text):
+        nodes.append(TextNode(text[text_start:], TextType.TEXT))
     return nodes
 
 
@@ -89,12 +239,8 @@ def split_nodes_link(old_nodes):
 
 
 def extract_markdown_images(text):
-    pattern = r"!\[([^\[\]]*)\]\(([^\(\)]*)\)"
-    matches = re.findall(pattern, text)
-    return matches
+    return IMAGE_PATTERN.findall(text)
 
 
 def extract_markdown_links(text):
-    pattern = r"(?<!!)\[([^\[\]]*)\]\(([^\(\)]*)\)"
-    matches = re.findall(pattern, text)
-    return matches
+    return LINK_PATTERN.findall(text)
@@ -0,0 +1,117 @@
+import re
+from urllib.parse import unquote, urljoin, urlsplit
+
+from site_index import page_url
+
+TEMPLATE_REF_PATTERN = re.compile(r'(?:href|src)="([^"]*)"')
+# root-relative paths with nothing to resolve or decode, which is what
+# nearly every link on a site looks like
+PLAIN_PATH_PATTERN = re.compile(r"(?:/[^/?#%.][^/?#%]*)+/?|/")
+
+
+class RouteIndex:
+    def __init__(self, dest_dir):
+        self.dest_dir = dest_dir
+        self.routes = set()
+
+    def add(self, path):
+        # a page is reachable as /dir/, /dir and /dir/index.html
+        url = page_url(path, self.dest_dir)
+        self.routes.add(url)
+        if url.endswith("/"):
+            self.routes.add(url + "index.html")
+            if url != "/":
+                self.routes.add(url[:-1])
+
+    def update(self, paths):
+        for path in paths:
+            self.add(path)
+
+    def remove(self, path):
+        url = page_url(path, self.dest_dir)
+        self.routes.discard(url)
+        if url.endswith("/"):
+            self.routes.discard(url + "index.html")
+            if url != "/":
+                self.routes.discard(url[:-1])
+
+    def __contains__(self, url):
+        return url in self.routes
+
+    def __len__(self):
+        return len(self.routes)
+
+    def __repr__(self):
+        return f"RouteIndex({self.dest_dir}, routes: {len(self.routes)})"
+
+
+def internal_path(url, base_url):
+    # the site path a link points at, or None for external links, other
+    # schemes and links to an anchor on the same page
+    if PLAIN_PATH_PATTERN.fullmatch(url):
+        return url
+    parts = urlsplit(url)
+    if parts.scheme or parts.netloc or not parts.path:
+        return None
+    return unquote(urlsplit(urljoin(base_url, parts.path)).path)
+
+
+def broken_links(meta, routes):
+    # returns (src_path, kind, url) for every link or image in the page
+    # metadata that no output answers to; each url is reported once a page
+    broken = []
+    for src_path, page in sorted(meta.items()):
+        base_url = page_url(page["dest"], routes.dest_dir)
+        for kind, urls in (("link", page.get("links", [])), ("image", page.get("images", []))):
+            seen = set()
+            for url in urls:
+                path = internal_path(url, base_url)
+                if path is None or path in routes or url in seen:
+                    continue
+                seen.add(url)
+                broken.append((src_path, kind, url))
+    return broken
+
+
+def broken_template_links(template_path, routes):
+    broken = []
+    with open(template_path) as f:
+        for number, line in enumerate(f, 1):
+            for url in TEMPLATE_REF_PATTERN.findall(line):
+                if "{{" in url:
+                    continue
+                path = internal_path(url, "/")
+                if path is not None and path not in routes:
+                    broken.append((template_path, number, url))
+    return broken
+
+
+def source_lines(src_path, urls):
+    # line numbers are only looked up for the few links that are broken,
+    # so rendering does not have to carry them around; returns {url: [line]}
+    # from one pass over the file
+    markers = {url: f"]({url}" for url in urls}
+    found = {url: [] for url in urls}
+    try:
+        with open(src_path) as f:
+            for number, line in enumerate(f, 1):
+                for url, marker in markers.items():
+                    if marker in line:
+                        found[url].append(number)
+    except OSError:
+        pass
+    return found
+
+
+def link_report(broken, template_broken=()):
+    lines = []
+    for src_path, number, url in template_broken:
+        lines.append(f"  {src_path}:{number}: broken link {url}")
+    urls = {}
+    for src_path, _, url in broken:
+        urls.setdefault(src_path, set()).add(url)
+    numbers = {src_path: source_lines(src_path, page_urls) for src_path, page_urls in urls.items()}
+    for src_path, kind, url in broken:
+        for number in numbers[src_path][url] or ["?"]:
+            lines.append(f"  {src_path}:{number}: broken {kind} {url}")
+    return lines
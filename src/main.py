@@ -1,12 +1,55 @@
+import argparse
 import os
 import shutil
 import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from itertools import chain
 
-from markdown_blocks import markdown_to_html_node
+import assets
+from devserver import DevServer, make_watcher
+from frontmatter import split_front_matter, template_values
+import highlight
+from htmlnode import escape_attribute, escape_text
+import images
+from links import RouteIndex, broken_links, broken_template_links, link_report
+from manifest import Manifest, hash_file, stale_outputs
+from markdown_blocks import (
+    BlockCache,
+    Document,
+    block_title,
+    iter_lines,
+    read_blocks,
+    write_blocks_html,
+)
+from pipeline import run_pipeline
+import profiler
+from search import build_search_index, index_paths
+from site_index import (
+    FEED_NAME,
+    build_site_index,
+    listing_urls,
+    url_dest_path,
+    write_site_index,
+)
+from static_sync import collect_files, sync_static
+from template import Template
 
+STATIC_DIR = "static"
+CONTENT_DIR = "content"
+TEMPLATE_PATH = "template.html"
+OUTPUT_DIR = "docs"
+MANIFEST_PATH = os.path.join(".cache", "manifest.json")
+HIGHLIGHT_CACHE_DIR = os.path.join(".cache", "highlight")
+IMAGE_CACHE_DIR = os.path.join(".cache", "images")
+PROFILE_PATH = os.path.join(".cache", "profile.json")
+# watch mode saves the manifest once no change has come in for this long
+SAVE_DELAY_SECONDS = 1.0
 
-def generate_pages_recursive(basepath, dir_path_content, template_path, dest_dir_path):
-    for item in os.listdir(dir_path_content):
+
+def collect_pages(dir_path_content, dest_dir_path):
+    pages = []
+    for item in sorted(os.listdir(dir_path_content)):
         src_path = os.path.join(dir_path_content, item)
 
         if os.path.isfile(src_path):
@@ -14,45 +57,300 @@ def generate_pages_recursive(basepath, dir_path_content, template_path, dest_dir
             dest_file = item
             if dest_file.endswith(".md"):
                 dest_file = dest_file[:-3] + ".html"
-            dest_path = os.path.join(dest_dir_path, dest_file)
-            generate_page(basepath, src_path, template_path, dest_path)
+            pages.append((src_path, os.path.join(dest_dir_path, dest_file)))
         else:
             # recurse into subdirectories, mirroring structure
             new_dest_dir = os.path.join(dest_dir_path, item)
-            generate_pages_recursive(basepath, src_path, template_path, new_dest_dir)
+            pages.extend(collect_pages(src_path, new_dest_dir))
+    return pages
 
 
-def generate_page(basepath, from_path, template_path, dest_path):
-    print(f"Generating page from {from_path} to {dest_path} using {template_path}")
+def page_dest_path(src_path, dir_path_content, dest_dir_path):
+    # the same mapping collect_pages applies while walking
+    dest_path = os.path.join(dest_dir_path, os.path.relpath(src_path, dir_path_content))
+    if dest_path.endswith(".md"):
+        dest_path = dest_path[:-3] + ".html"
+    return dest_path
+
+
+class PageBuildError(Exception):
+    pass
+
+
+def generate_pages_recursive(
+    basepath,
+    dir_path_content,
+    template_path,
+    dest_dir_path,
+    jobs=1,
+    block_cache=None,
+    io_threads=0,
+):
+    template = Template.load(template_path, basepath)
+    with profiler.phase("walk"):
+        pages = collect_pages(dir_path_content, dest_dir_path)
+    return generate_pages(pages, template, jobs, block_cache, io_threads)
+
+
+def generate_pages(pages, template, jobs=1, block_cache=None, io_threads=0):
+    # returns the metadata of every page, keyed by source path
+    meta = {}
+    if io_threads > 0 and len(pages) > 1:
+        return generate_pages_pipelined(pages, template, block_cache, io_threads)
+    if jobs <= 1 or len(pages) <= 1:
+        for src_path, dest_path in pages:
+            try:
+                meta[src_path] = generate_page(src_path, template, dest_path, block_cache)
+            except Exception as e:
+                raise PageBuildError(f"failed to generate page from {src_path}: {e}") from e
+        return meta
+
+    # every worker keeps its own cache and profiler; their counters and page
+    # timings are merged into the parent's as pages finish
+    cache_size = block_cache.max_size if block_cache is not None else 0
+    prof = profiler.active()
+    highlight_cache = highlight.cache()
+    with ProcessPoolExecutor(
+        max_workers=jobs,
+        initializer=init_worker,
+        initargs=(
+            cache_size,
+            prof is not None,
+            highlight.settings(),
+            images.table(),
+            assets.table(),
+        ),
+    ) as executor:
+        futures = {}
+        for i, (src_path, dest_path) in enumerate(pages):
+            future = executor.submit(render_page_in_worker, src_path, template, dest_path)
+            futures[future] = i
+
+        # pages finish in any order, but they are logged in walk order so
+        # the output is the same on every run
+        finished = [False] * len(pages)
+        next_log = 0
+        for future in as_completed(futures):
+            i = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                # pages not started yet are dropped, but running ones are
+                # waited for so nothing is still writing once this raises
+                executor.shutdown(cancel_futures=True)
+                raise PageBuildError(f"failed to generate page from {pages[i][0]}: {e}") from e
+            if block_cache is not None:
+                block_cache.hits += result["cache_hits"]
+                block_cache.misses += result["cache_misses"]
+            if highlight_cache is not None:
+                highlight_cache.hits += result["highlight_hits"]
+                highlight_cache.misses += result["highlight_misses"]
+            if prof is not None:
+                prof.add_page(result["profile"])
+            meta[pages[i][0]] = result["meta"]
+            finished[i] = True
+            while next_log < len(pages) and finished[next_log]:
+                src_path, dest_path = pages[next_log]
+                print(page_log_line(src_path, template, dest_path))
+                next_log += 1
+    return dict(sorted(meta.items()))
+
+
+def generate_pages_pipelined(pages, template, block_cache=None, io_threads=4):
+    # reading and writing overlap with rendering: sources are prefetched and
+    # outputs flushed by a pool of I/O threads while this thread renders
+    meta = {}
+
+    def read(page):
+        try:
+            return read_source(page[0])
+        except Exception as e:
+            raise PageBuildError(f"failed to generate page from {page[0]}: {e}") from e
+
+    def render(page, data):
+        src_path, dest_path = page
+        print(page_log_line(src_path, template, dest_path))
+        try:
+            html, meta[src_path] = render_page_text(
+                src_path, *data, template, dest_path, block_cache
+            )
+        except Exception as e:
+            raise PageBuildError(f"failed to generate page from {src_path}: {e}") from e
+        return html
+
+    def write(page, html):
+        try:
+            write_output(page[1], html)
+        except Exception as e:
+            raise PageBuildError(f"failed to generate page from {page[0]}: {e}") from e
+
+    stats = run_pipeline(pages, read, render, write, io_threads, depth=io_threads * 2)
+    print(stats.stats_line())
+    return meta
+
+
+def page_log_line(from_path, template, dest_path):
+    return f"Generating page from {from_path} to {dest_path} using {template.path}"
+
+
+def generate_page(from_path, template, dest_path, block_cache=None):
+    print(page_log_line(from_path, template, dest_path))
+    return render_page(from_path, template, dest_path, block_cache)
+
+
+_worker_block_cache = None
 
-    with open(from_path) as f:
-        markdown = f.read()
 
-    with open(template_path) as f:
-        template = f.read()
+def init_worker(
+    cache_size, profile=False, highlighting=(True, None), image_table=None, asset_table=None
+):
+    global _worker_block_cache
+    if cache_size > 0:
+        _worker_block_cache = BlockCache(cache_size)
+    highlight.configure(*highlighting)
+    images.set_table(image_table or {})
+    assets.set_table(asset_table or {})
+    if profile:
+        profiler.start()
 
-    html_node = markdown_to_html_node(markdown)
-    html = html_node.to_html()
 
-    title = extract_title(markdown)
+def render_page_in_worker(from_path, template, dest_path):
+    cache = _worker_block_cache
+    hits, misses = (cache.hits, cache.misses) if cache is not None else (0, 0)
+    highlight_cache = highlight.cache()
+    if highlight_cache is not None:
+        highlight_hits, highlight_misses = highlight_cache.hits, highlight_cache.misses
+    meta = render_page(from_path, template, dest_path, cache)
+    result = {
+        "meta": meta,
+        "cache_hits": 0,
+        "cache_misses": 0,
+        "highlight_hits": 0,
+        "highlight_misses": 0,
+        "profile": None,
+    }
+    if cache is not None:
+        result["cache_hits"] = cache.hits - hits
+        result["cache_misses"] = cache.misses - misses
+    if highlight_cache is not None:
+        result["highlight_hits"] = highlight_cache.hits - highlight_hits
+        result["highlight_misses"] = highlight_cache.misses - highlight_misses
+    prof = profiler.active()
+    if prof is not None:
+        result["profile"] = prof.pages.pop()
+    return result
 
-    template = template.replace("{{ Title }}", title)
-    template = template.replace("{{ Content }}", html)
-    template = template.replace('href="/', f'href="{basepath}')
-    template = template.replace('src="/', f'src="{basepath}')
 
-    dirname = os.path.dirname(dest_path)
-    if dirname and not os.path.exists(dirname):
-        os.makedirs(dirname)
+def render_page(from_path, template, dest_path, block_cache=None):
+    with profiler.page(from_path), open(from_path) as source:
+        lines = profiler.timed_iter(iter_lines(source), "read")
+        doc, front_matter, blocks = begin_page(lines)
+        values = page_values(template, doc, front_matter, blocks, block_cache)
 
-    with open(dest_path, "w") as f:
-        f.write(template)
+        # the content is serialized block by block straight into the file;
+        # the rename keeps a failed page from leaving a half-written output
+        tmp_path = dest_path + ".tmp"
+        try:
+            with profiler.phase("write"):
+                # worker processes may create the same directory at once
+                dirname = os.path.dirname(dest_path)
+                if dirname:
+                    os.makedirs(dirname, exist_ok=True)
+                f = open(tmp_path, "w")
+            with f:
+                with profiler.phase("template"):
+                    template.write(profiler.timed(f.write, "write"), values)
+                with profiler.phase("write"):
+                    f.close()
+            with profiler.phase("write"):
+                os.replace(tmp_path, dest_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return page_meta(doc, front_matter, int(os.fstat(source.fileno()).st_mtime), dest_path)
+
+
+def render_page_text(from_path, text, mtime, template, dest_path, block_cache=None):
+    # the pipelined build's render stage: the source was already read and
+    # the html is handed to a writer instead of going straight to disk
+    with profiler.page(from_path):
+        doc, front_matter, blocks = begin_page(text.split("\n"))
+        values = page_values(template, doc, front_matter, blocks, block_cache)
+        with profiler.phase("template"):
+            html = template.render(values)
+    return html, page_meta(doc, front_matter, mtime, dest_path)
+
+
+def begin_page(lines):
+    # the front matter is parsed first, then the markdown is split into
+    # blocks lazily; without a title in the front matter, the blocks up to
+    # the first "# " heading are held back until it is seen, and the rest
+    # of the metadata is collected while rendering
+    doc = Document()
+    head = []
+    with profiler.phase("title"):
+        front_matter, lines = split_front_matter(lines)
+        doc.title = front_matter.get("title")
+        blocks = read_blocks(lines)
+        if doc.title is None:
+            for block in blocks:
+                head.append(block)
+                doc.title = block_title(*block)
+                if doc.title is not None:
+                    break
+        if doc.title is None:
+            raise Exception("Header was not found")
+    return doc, front_matter, chain(head, blocks)
+
+
+def page_values(template, doc, front_matter, blocks, block_cache=None):
+    # front matter values may end up inside attributes, so quotes are
+    # escaped too
+    values = template.blank_values()
+    for key, value in template_values(front_matter).items():
+        values[key] = escape_attribute(value)
+    values["Title"] = escape_text(doc.title)
+    values["Content"] = lambda write: write_content(blocks, write, block_cache, doc)
+    return values
+
+
+def page_meta(doc, front_matter, mtime, dest_path):
+    meta = {"title": doc.title, "mtime": mtime, "dest": dest_path}
+    meta.update(doc.to_json())
+    if front_matter:
+        meta["front_matter"] = front_matter
+    return meta
+
+
+def read_source(from_path):
+    with open(from_path) as f:
+        return f.read(), int(os.fstat(f.fileno()).st_mtime)
+
+
+def write_output(dest_path, html):
+    tmp_path = dest_path + ".tmp"
+    try:
+        os.makedirs(os.path.dirname(dest_path) or ".", exist_ok=True)
+        with open(tmp_path, "w") as f:
+            f.write(html)
+        os.replace(tmp_path, dest_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def write_content(blocks, write, block_cache=None, doc=None):
+    with profiler.phase("serialize"):
+        write_blocks_html(blocks, write, block_cache, doc)
 
 
 def extract_title(markdown):
-    for line in markdown.splitlines():
-        if line.startswith("# "):
-            return line[2:].strip()
+    for block_type, lines in read_blocks(markdown.split("\n")):
+        title = block_title(block_type, lines)
+        if title is not None:
+            return title
     raise Exception("Header was not found")
 
 
@@ -74,14 +372,545 @@ def copy_static_recursive(src_dir, dest_dir):
             copy_static_recursive(src_path, dest_path)
 
 
+def generate_pages_incremental(
+    basepath,
+    dir_path_content,
+    template_path,
+    dest_dir_path,
+    manifest,
+    jobs=1,
+    block_cache=None,
+    io_threads=0,
+):
+    # the template, basepath, highlighter, image and asset tables are part
+    # of every entry, so changing any of them invalidates all pages
+    template_hash = hash_file(template_path)
+    template = Template.load(template_path, basepath)
+    pages = {}
+    meta = {}
+    changed = []
+    with profiler.phase("walk"):
+        collected = collect_pages(dir_path_content, dest_dir_path)
+    with profiler.phase("manifest"):
+        for src_path, dest_path in collected:
+            entry = page_entry(src_path, dest_path, template_hash, basepath)
+            pages[src_path] = entry
+            if manifest.is_fresh("pages", src_path, entry) and src_path in manifest.meta:
+                meta[src_path] = manifest.meta[src_path]
+            else:
+                changed.append((src_path, dest_path))
+
+    meta.update(generate_pages(changed, template, jobs, block_cache, io_threads))
+
+    remove_outputs(stale_outputs(manifest.pages, pages))
+    manifest.pages = pages
+    manifest.meta = dict(sorted(meta.items()))
+    print(f"Skipped {len(pages) - len(changed)} unchanged pages")
+
+
+def generate_pages_full(
+    basepath,
+    dir_path_content,
+    template_path,
+    dest_dir_path,
+    manifest,
+    jobs=1,
+    block_cache=None,
+    io_threads=0,
+):
+    # every page is rewritten, but the entries are still recorded so a later
+    # incremental build can skip them; when the output directory was not
+    # wiped, it may hold pages whose sources are gone since the last build
+    meta = generate_pages_recursive(
+        basepath, dir_path_content, template_path, dest_dir_path, jobs, block_cache, io_threads
+    )
+    with profiler.phase("manifest"):
+        template_hash = hash_file(template_path)
+        pages = {
+            src_path: page_entry(src_path, page["dest"], template_hash, basepath)
+            for src_path, page in meta.items()
+        }
+    remove_outputs(stale_outputs(manifest.pages, pages))
+    manifest.pages = pages
+    manifest.meta = dict(sorted(meta.items()))
+
+
+def page_entry(src_path, dest_path, template_hash, basepath):
+    return {
+        "hash": hash_file(src_path),
+        "template": template_hash,
+        "basepath": basepath,
+        "highlighter": highlight.highlighter_version(),
+        "images": images.table_version(),
+        "assets": assets.table_version(),
+        "dest": dest_path,
+    }
+
+
+def watch(args, block_cache=None):
+    basepath = args.basepath
+    manifest = Manifest.load(MANIFEST_PATH)
+    sync_static(STATIC_DIR, OUTPUT_DIR, manifest)
+    images.optimize_images(STATIC_DIR, OUTPUT_DIR, manifest, image_jobs(args.jobs))
+    generate_pages_incremental(
+        basepath, CONTENT_DIR, TEMPLATE_PATH, OUTPUT_DIR, manifest, args.jobs, block_cache
+    )
+    template = Template.load(TEMPLATE_PATH, basepath)
+    update_site_index(manifest, template, args.site_url)
+    update_search_index(manifest, basepath, not args.no_search)
+    routes = link_routes(manifest)
+    check_links(manifest, routes)
+    manifest.save()
+
+    server = DevServer(OUTPUT_DIR, basepath, args.host, args.port)
+    server.start()
+    watcher = make_watcher([CONTENT_DIR, STATIC_DIR], [TEMPLATE_PATH])
+    print(f"Serving {OUTPUT_DIR} at {server.url}, watching for changes (Ctrl-C to stop)")
+
+    # the template, the parser, the route index and the search shards read
+    # so far stay loaded between rebuilds, and the manifest is only saved
+    # once edits stop coming in
+    template_hash = hash_file(TEMPLATE_PATH)
+    search_cache = {}
+    static_prefix = os.path.normpath(STATIC_DIR) + os.sep
+    unsaved = False
+    try:
+        while True:
+            changed = watcher.wait(SAVE_DELAY_SECONDS if unsaved else None)
+            if not changed:
+                if unsaved:
+                    manifest.save()
+                    unsaved = False
+                continue
+            start = time.perf_counter()
+            try:
+                unsaved = True
+                if os.path.normpath(TEMPLATE_PATH) in changed:
+                    template = Template.load(TEMPLATE_PATH, basepath)
+                    template_hash = hash_file(TEMPLATE_PATH)
+                generated = manifest.generated
+                touched, failures = rebuild_changed(
+                    changed, template, template_hash, manifest, args.jobs, block_cache
+                )
+                # the whole site is only looked at again when every page may
+                # have changed; otherwise just the touched pages and the
+                # listings, shards and links that depend on them
+                update_site_index(manifest, template, args.site_url, touched)
+                update_search_index(
+                    manifest, basepath, not args.no_search, touched, search_cache
+                )
+                if touched is None or any(path.startswith(static_prefix) for path in changed):
+                    routes = link_routes(manifest)
+                    check_links(manifest, routes)
+                elif update_routes(routes, manifest, touched, generated):
+                    # links on other pages may point at what came or went
+                    check_links(manifest, routes)
+                else:
+                    check_links(manifest, routes, touched)
+            except Exception as e:
+                # keep serving the last good build until the next save
+                print(f"Rebuild failed: {e}")
+                continue
+            # the other files in the batch were still rebuilt
+            for path, e in failures:
+                print(f"Rebuild failed for {path}: {e}")
+            server.notify_reload()
+            print(f"Rebuilt in {(time.perf_counter() - start) * 1000:.0f} ms")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        watcher.close()
+        server.stop()
+        if unsaved:
+            manifest.save()
+
+
+def rebuild_changed(changed, template, template_hash, manifest, jobs=1, block_cache=None):
+    # returns ({src_path: its metadata before, None for a new page} for every
+    # page rendered or removed, or None when every page may have changed,
+    # [(src_path, error)] for the pages that failed to render)
+    touched = {}
+    failures = []
+    if any(path.startswith(os.path.normpath(STATIC_DIR) + os.sep) for path in changed):
+        sync_static(STATIC_DIR, OUTPUT_DIR, manifest)
+        image_version = images.table_version()
+        images.optimize_images(STATIC_DIR, OUTPUT_DIR, manifest, image_jobs(jobs))
+        if images.table_version() != image_version:
+            # pages carry image sizes and variants, and so do cached blocks
+            if block_cache is not None:
+                block_cache.clear()
+            changed = set(changed) | {os.path.normpath(TEMPLATE_PATH)}
+    if os.path.normpath(TEMPLATE_PATH) in changed:
+        # every page depends on the template
+        generate_pages_incremental(
+            template.basepath, CONTENT_DIR, TEMPLATE_PATH, OUTPUT_DIR, manifest, jobs, block_cache
+        )
+        touched = None
+
+    content_prefix = os.path.normpath(CONTENT_DIR) + os.sep
+    for path in sorted(changed):
+        if not path.startswith(content_prefix):
+            continue
+        if os.path.isfile(path):
+            dest_path = page_dest_path(path, CONTENT_DIR, OUTPUT_DIR)
+            entry = page_entry(path, dest_path, template_hash, template.basepath)
+            if not manifest.is_fresh("pages", path, entry):
+                try:
+                    meta = generate_page(path, template, dest_path, block_cache)
+                except Exception as e:
+                    # one bad file keeps its last output and is tried again
+                    # on its next change
+                    failures.append((path, e))
+                    continue
+                if touched is not None:
+                    touched[path] = manifest.meta.get(path)
+                manifest.meta[path] = meta
+                manifest.pages[path] = entry
+            continue
+        # a deleted file, or a deleted or moved-away directory
+        for src_path in [p for p in manifest.pages if p == path or p.startswith(path + os.sep)]:
+            remove_outputs([manifest.pages.pop(src_path)["dest"]])
+            meta = manifest.meta.pop(src_path, None)
+            if touched is not None:
+                touched[src_path] = meta
+    return touched, failures
+
+
+def image_jobs(jobs):
+    # encoding is cpu bound and independent of how pages are rendered
+    return jobs if jobs > 1 else os.cpu_count() or 1
+
+
+def update_site_index(manifest, template, site_url="", touched=None):
+    # with touched, only the listings those pages were or are in are built
+    # again, and the sitemap waits for the next full build
+    with profiler.phase("index"):
+        if touched is None:
+            outputs = build_site_index(manifest.meta, template, OUTPUT_DIR, site_url)
+            candidates = set(manifest.generated)
+        else:
+            only = set()
+            for src_path, old_page in touched.items():
+                for page in (old_page, manifest.meta.get(src_path)):
+                    if page is not None:
+                        only |= listing_urls(page, OUTPUT_DIR)
+            if not only:
+                return
+            outputs = build_site_index(manifest.meta, template, OUTPUT_DIR, site_url, only=only)
+            paths = {
+                url_dest_path(url + name, OUTPUT_DIR) for url in only for name in ("", FEED_NAME)
+            }
+            candidates = set(manifest.generated) & paths
+        write_site_index(outputs)
+        # listings that are no longer generated, unless a page now owns the path
+        stale = candidates - set(outputs)
+        if stale:
+            stale -= {page["dest"] for page in manifest.meta.values()}
+        remove_outputs(sorted(stale))
+        manifest.generated = sorted(set(manifest.generated) - candidates | set(outputs))
+    print(f"Wrote site index: {len(outputs)} files")
+    if not site_url and touched is None:
+        print("Skipped sitemap.xml and feeds: they need absolute urls, pass --site-url")
+
+
+def update_search_index(manifest, basepath, enabled=True, touched=None, cache=None):
+    # with touched, only those pages are looked at
+    with profiler.phase("search"):
+        if enabled:
+            outputs, removed, manifest.search = build_search_index(
+                manifest.meta,
+                manifest.search,
+                OUTPUT_DIR,
+                basepath,
+                page_terms,
+                None if touched is None else set(touched),
+                cache,
+            )
+            write_site_index(outputs)
+        else:
+            removed = index_paths(manifest.search, OUTPUT_DIR)
+            manifest.search = {}
+        remove_outputs(removed)
+        # the postings live in the shard files; keeping every page's term
+        # counts in the manifest would make it many times larger
+        for src_path in manifest.meta if touched is None else touched:
+            manifest.meta.get(src_path, {}).pop("terms", None)
+    if enabled:
+        shards = len(manifest.search["shards"])
+        print(f"Wrote search index: {len(outputs)} of {shards + 1} files changed")
+
+
+def page_terms(src_path):
+    # only asked for when a shard has to be written from scratch and holds
+    # a page that was not rendered this build
+    with open(src_path) as f:
+        doc, _, blocks = begin_page(iter_lines(f))
+        write_blocks_html(blocks, lambda html: None, None, doc)
+    return doc.to_json()["terms"]
+
+
+def link_routes(manifest):
+    # every output of this build goes into the route index
+    with profiler.phase("links"):
+        routes = RouteIndex(OUTPUT_DIR)
+        routes.update(dest for _, dest in collect_files(STATIC_DIR, OUTPUT_DIR))
+        routes.update(page["dest"] for page in manifest.meta.values())
+        routes.update(manifest.generated)
+        routes.update(
+            variant["dest"] for image in manifest.images.values() for variant in image["variants"]
+        )
+        routes.update(entry["dest"] for entry in manifest.fingerprints.values())
+    return routes
+
+
+def update_routes(routes, manifest, touched, generated):
+    # keeps a route index in step with pages and listings that came or went
+    # since generated was the list of listings; returns whether any did
+    came = set(manifest.generated) - set(generated)
+    went = set(generated) - set(manifest.generated)
+    for src_path, old_page in touched.items():
+        page = manifest.meta.get(src_path)
+        if old_page is None and page is not None:
+            came.add(page["dest"])
+        elif old_page is not None and page is None:
+            went.add(old_page["dest"])
+    for path in went:
+        routes.remove(path)
+    routes.update(came)
+    return bool(came or went)
+
+
+def check_links(manifest, routes=None, only=None):
+    # each link and image the pages recorded while rendering is looked up in
+    # the route index; with only, just those pages' links are checked
+    if routes is None:
+        routes = link_routes(manifest)
+    with profiler.phase("links"):
+        if only is None:
+            broken = broken_links(manifest.meta, routes)
+            template_broken = broken_template_links(TEMPLATE_PATH, routes)
+        else:
+            meta = {
+                src_path: manifest.meta[src_path] for src_path in only if src_path in manifest.meta
+            }
+            broken = broken_links(meta, routes)
+            template_broken = []
+    count = len(broken) + len(template_broken)
+    if count:
+        print(f"Broken links: {count}")
+        for line in link_report(broken, template_broken):
+            print(line)
+    return count
+
+
+def remove_outputs(paths):
+    for path in paths:
+        if os.path.isfile(path):
+            print(f"Removing stale output {path}")
+            os.remove(path)
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Build the site from content/ into docs/")
+    parser.add_argument("basepath", nargs="?", default="/")
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help=f"only rebuild pages and assets that changed since the last build (state in {MANIFEST_PATH})",
+    )
+    parser.add_argument(
+        "--sync-static",
+        action="store_true",
+        help="copy only new or changed static files instead of wiping docs/ (implied by --incremental)",
+    )
+    parser.add_argument(
+        "--checksum",
+        action="store_true",
+        help="compare static files by content hash rather than size and mtime",
+    )
+    parser.add_argument(
+        "--hardlink",
+        action="store_true",
+        help="hardlink static files into docs/ where the filesystem allows it",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=1,
+        help="render pages in N worker processes (0 uses every core)",
+    )
+    parser.add_argument(
+        "--pipeline",
+        nargs="?",
+        type=int,
+        const=4,
+        default=0,
+        metavar="N",
+        help="overlap reading and writing pages with rendering, using N I/O threads (default 4)",
+    )
+    parser.add_argument(
+        "--block-cache",
+        type=int,
+        default=0,
+        metavar="N",
+        help="reuse the html of up to N recently seen blocks that repeat across pages",
+    )
+    parser.add_argument(
+        "--site-url",
+        default="",
+        help="absolute site url, e.g. https://example.com, used for sitemap.xml and feed links",
+    )
+    parser.add_argument(
+        "--no-highlight",
+        action="store_true",
+        help=f"leave fenced code plain instead of highlighting it with pygments (cached in {HIGHLIGHT_CACHE_DIR})",
+    )
+    parser.add_argument(
+        "--no-images",
+        action="store_true",
+        help=f"skip resized webp variants of static images (cached in {IMAGE_CACHE_DIR}; needs pillow)",
+    )
+    parser.add_argument(
+        "--no-search",
+        action="store_true",
+        help="skip writing the client-side search index to docs/search/",
+    )
+    parser.add_argument(
+        "--strict-links",
+        action="store_true",
+        help="fail the build when a page links to a path the build does not produce",
+    )
+    parser.add_argument(
+        "--fingerprint",
+        action="store_true",
+        help="copy static assets to content-hashed names and point pages and the template at them",
+    )
+    parser.add_argument(
+        "--compress",
+        action="store_true",
+        help="write precompressed .gz (and .br, with the brotli module) siblings of text outputs",
+    )
+    parser.add_argument(
+        "--profile",
+        nargs="?",
+        const=PROFILE_PATH,
+        metavar="PATH",
+        help=f"time every build phase per page, print a summary and write a JSON report (default {PROFILE_PATH})",
+    )
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="build incrementally, serve docs/ with live reload and rebuild on changes",
+    )
+    parser.add_argument("--host", default="0.0.0.0", help="address the --watch server binds to")
+    parser.add_argument("--port", type=int, default=8888, help="port the --watch server listens on")
+    args = parser.parse_args(argv)
+    if args.jobs < 0:
+        parser.error("--jobs must not be negative")
+    if args.block_cache < 0:
+        parser.error("--block-cache must not be negative")
+    if args.pipeline < 0:
+        parser.error("--pipeline must not be negative")
+    if args.pipeline and args.jobs != 1:
+        parser.error("--pipeline renders in one process and cannot be combined with --jobs")
+    if args.watch and (args.fingerprint or args.compress):
+        parser.error("--fingerprint and --compress are for deploy builds, not --watch")
+    if args.jobs == 0:
+        args.jobs = os.cpu_count() or 1
+    return args
+
+
 def main():
-    if len(sys.argv) > 1:
-        basepath = sys.argv[1]
+    args = parse_args(sys.argv[1:])
+    basepath = args.basepath
+    block_cache = BlockCache(args.block_cache) if args.block_cache else None
+    highlight.configure(not args.no_highlight, HIGHLIGHT_CACHE_DIR)
+    images.configure(not args.no_images, IMAGE_CACHE_DIR)
+
+    if args.watch:
+        watch(args, block_cache)
+        return
+
+    if args.profile:
+        profiler.start()
+
+    with profiler.phase("manifest"):
+        manifest = Manifest.load(MANIFEST_PATH)
+
+    with profiler.phase("static"):
+        if args.incremental or args.sync_static:
+            sync_static(STATIC_DIR, OUTPUT_DIR, manifest, args.checksum, args.hardlink)
+        else:
+            copy_static_recursive(STATIC_DIR, OUTPUT_DIR)
+            manifest.assets = {}
+
+    with profiler.phase("images"):
+        images.optimize_images(STATIC_DIR, OUTPUT_DIR, manifest, image_jobs(args.jobs))
+
+    with profiler.phase("assets"):
+        if args.fingerprint:
+            assets.fingerprint_assets(STATIC_DIR, OUTPUT_DIR, manifest)
+        else:
+            remove_outputs(stale_outputs(manifest.fingerprints, {}))
+            manifest.fingerprints = {}
+
+    if args.incremental:
+        generate_pages_incremental(
+            basepath,
+            CONTENT_DIR,
+            TEMPLATE_PATH,
+            OUTPUT_DIR,
+            manifest,
+            args.jobs,
+            block_cache,
+            args.pipeline,
+        )
     else:
-        basepath = "/"
+        generate_pages_full(
+            basepath,
+            CONTENT_DIR,
+            TEMPLATE_PATH,
+            OUTPUT_DIR,
+            manifest,
+            args.jobs,
+            block_cache,
+            args.pipeline,
+        )
+    update_site_index(manifest, Template.load(TEMPLATE_PATH, basepath), args.site_url)
+    update_search_index(manifest, basepath, not args.no_search)
+    broken = check_links(manifest)
+
+    with profiler.phase("compress"):
+        if args.compress:
+            assets.compress_outputs(OUTPUT_DIR, manifest, image_jobs(args.jobs))
+        else:
+            remove_outputs(
+                sorted(output for entry in manifest.compressed.values() for output in entry["outputs"])
+            )
+            manifest.compressed = {}
+
+    with profiler.phase("manifest"):
+        manifest.save()
+
+    if block_cache is not None:
+        print(block_cache.stats_line())
+    highlight_cache = highlight.cache()
+    if highlight_cache is not None and highlight_cache.hits + highlight_cache.misses:
+        print(highlight_cache.stats_line())
+    image_cache = images.cache()
+    if image_cache is not None and image_cache.hits + image_cache.misses:
+        print(image_cache.stats_line())
+
+    if args.profile:
+        prof = profiler.stop()
+        prof.finish()
+        print(prof.report())
+        prof.save(args.profile)
+        print(f"Wrote profile to {args.profile}")
 
-    copy_static_recursive("static", "docs")
-    generate_pages_recursive(basepath, "content", "template.html", "docs")
+    if broken and args.strict_links:
+        sys.exit(f"{broken} broken links")
 
 
 if __name__ == "__main__":
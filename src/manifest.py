@@ -0,0 +1,98 @@
+import hashlib
+import json
+import os
+
+MANIFEST_VERSION = 5
+
+
+def hash_file(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 16), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class Manifest:
+    def __init__(
+        self,
+        path,
+        pages=None,
+        assets=None,
+        meta=None,
+        generated=None,
+        images=None,
+        fingerprints=None,
+        compressed=None,
+        search=None,
+    ):
+        self.path = path
+        self.pages = pages if pages is not None else {}
+        self.assets = assets if assets is not None else {}
+        # per-page metadata for the site index, and the files it wrote
+        self.meta = meta if meta is not None else {}
+        self.generated = generated if generated is not None else []
+        # image sizes and the variants written for them
+        self.images = images if images is not None else {}
+        # content-named copies of static assets, and precompressed outputs
+        self.fingerprints = fingerprints if fingerprints is not None else {}
+        self.compressed = compressed if compressed is not None else {}
+        # search index page ids and shards, for incremental updates
+        self.search = search if search is not None else {}
+
+    @classmethod
+    def load(cls, path):
+        # a missing, corrupt or outdated manifest just means a full rebuild
+        try:
+            with open(path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return cls(path)
+        if not isinstance(data, dict) or data.get("version") != MANIFEST_VERSION:
+            return cls(path)
+        return cls(
+            path,
+            data.get("pages", {}),
+            data.get("assets", {}),
+            data.get("meta", {}),
+            data.get("generated", []),
+            data.get("images", {}),
+            data.get("fingerprints", {}),
+            data.get("compressed", {}),
+            data.get("search", {}),
+        )
+
+    def save(self):
+        dirname = os.path.dirname(self.path)
+        if dirname and not os.path.exists(dirname):
+            os.makedirs(dirname)
+        data = {
+            "version": MANIFEST_VERSION,
+            "pages": self.pages,
+            "assets": self.assets,
+            "meta": self.meta,
+            "generated": self.generated,
+            "images": self.images,
+            "fingerprints": self.fingerprints,
+            "compressed": self.compressed,
+            "search": self.search,
+        }
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            # compact, since it is rewritten on every build
+            json.dump(data, f, separators=(",", ":"), sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+    def is_fresh(self, section, src_path, entry):
+        old_entry = getattr(self, section).get(src_path)
+        return old_entry == entry and os.path.exists(entry["dest"])
+
+    def __repr__(self):
+        return f"Manifest({self.path}, pages: {len(self.pages)}, assets: {len(self.assets)})"
+
+
+def stale_outputs(old_entries, new_entries):
+    # outputs that were produced last time but no current source maps to
+    old_dests = {entry["dest"] for entry in old_entries.values()}
+    new_dests = {entry["dest"] for entry in new_entries.values()}
+    return sorted(old_dests - new_dests)
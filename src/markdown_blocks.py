@@ -1,7 +1,10 @@
+from collections import Counter, OrderedDict
 from enum import Enum
 
-from htmlnode import ParentNode
+from highlight import fence_language, highlight_code
+from htmlnode import ParentNode, RawNode
 from inline_markdown import text_to_textnodes
+from search import count_terms
 from textnode import TextNode, TextType, text_node_to_html_node
 
 
@@ -15,34 +18,111 @@ class BlockType(Enum):
 
 
 def markdown_to_blocks(markdown):
-    blocks = markdown.split("\n\n")
-    filtered_blocks = []
-    for block in blocks:
-        if block == "":
+    return ["\n".join(lines) for lines in split_blocks(markdown.split("\n"))]
+
+
+def iter_lines(f):
+    # yields the same lines as f.read().split("\n") without reading the
+    # whole file into memory
+    ended_with_newline = True
+    for line in f:
+        ended_with_newline = line.endswith("\n")
+        yield line[:-1] if ended_with_newline else line
+    if ended_with_newline:
+        yield ""
+
+
+def split_blocks(lines):
+    # same blocks as splitting the joined text on "\n\n" and stripping
+    # each block, but each line is only looked at once; a block opening
+    # with a ``` fence runs to the closing fence, blank lines included
+    lines = iter(lines)
+    block = [next(lines, "")]
+    blank = not block[0].strip()
+    fenced = opens_fence(block[0])
+    closed = False
+    for line in lines:
+        if fenced:
+            block.append(line)
+            if opens_fence(line):
+                fenced = False
+                closed = True
+            continue
+        if line == "":
+            following = next(lines, None)
+            if following is not None:
+                if block != [""]:
+                    yield strip_block(block)
+                block = [following]
+                blank = not following.strip()
+                fenced = opens_fence(following)
+                closed = False
+                continue
+        elif closed and line.strip():
+            # text right after a closing fence starts a new block
+            yield strip_block(block)
+            block = [line]
+            fenced = opens_fence(line)
+            closed = False
             continue
-        block = block.strip()
-        filtered_blocks.append(block)
-    return filtered_blocks
+        block.append(line)
+        if blank and line.strip():
+            blank = False
+            fenced = opens_fence(line)
+    if fenced:
+        # an unclosed fence runs to the end of the document, so it is closed
+        # there rather than looked at again
+        yield strip_block(block) + ["```"]
+    elif block != [""]:
+        yield strip_block(block)
+
+
+def opens_fence(line):
+    # the same test closes a fence, so an indented fence closes too
+    return line.lstrip().startswith("```")
+
+
+def strip_block(lines):
+    start = 0
+    end = len(lines)
+    while start < end and not lines[start].strip():
+        start += 1
+    while end > start and not lines[end - 1].strip():
+        end -= 1
+    if start == end:
+        return [""]
+    lines = lines[start:end]
+    lines[0] = lines[0].lstrip()
+    lines[-1] = lines[-1].rstrip()
+    return lines
+
+
+def read_blocks(lines):
+    for block_lines in split_blocks(lines):
+        yield lines_to_block_type(block_lines), block_lines
 
 
 def block_to_block_type(block):
-    lines = block.split("\n")
+    return lines_to_block_type(block.split("\n"))
 
-    if block.startswith(("# ", "## ", "### ", "#### ", "##### ", "###### ")):
+
+def lines_to_block_type(lines):
+    first = lines[0]
+    if first.startswith(("# ", "## ", "### ", "#### ", "##### ", "###### ")):
         return BlockType.HEADING
-    if len(lines) > 1 and lines[0].startswith("```") and lines[-1].startswith("```"):
+    if len(lines) > 1 and first.startswith("```") and opens_fence(lines[-1]):
         return BlockType.CODE
-    if block.startswith(">"):
+    if first.startswith(">"):
         for line in lines:
             if not line.startswith(">"):
                 return BlockType.PARAGRAPH
         return BlockType.QUOTE
-    if block.startswith("- "):
+    if first.startswith("- "):
         for line in lines:
             if not line.startswith("- "):
                 return BlockType.PARAGRAPH
         return BlockType.ULIST
-    if block.startswith("1. "):
+    if first.startswith("1. "):
         i = 1
         for line in lines:
             if not line.startswith(f"{i}. "):
@@ -53,48 +133,195 @@ def block_to_block_type(block):
 
 
 def markdown_to_html_node(markdown):
-    blocks = markdown_to_blocks(markdown)
-    children = []
-    for block in blocks:
-        html_node = block_to_html_node(block)
-        children.append(html_node)
+    children = list(markdown_to_html_nodes(markdown))
     return ParentNode("div", children, None)
 
 
-def block_to_html_node(block):
-    block_type = block_to_block_type(block)
+def markdown_to_document(markdown, cache=None):
+    doc = Document()
+    children = list(blocks_to_html_nodes(read_blocks(markdown.split("\n")), cache, doc))
+    doc.node = ParentNode("div", children, None)
+    return doc
+
+
+def block_title(block_type, lines):
+    # the page title is the text of the first "# " heading
+    if block_type == BlockType.HEADING and lines[0].startswith("# "):
+        return lines[0][2:].strip()
+    return None
+
+
+class Document:
+    # metadata gathered while the blocks are turned into nodes, so nothing
+    # has to walk the page a second time
+    def __init__(self):
+        self.node = None
+        self.title = None
+        self.headings = []
+        self.words = 0
+        self.links = []
+        self.images = []
+        # term counts for the search index; the text of the current block is
+        # tokenized in one go when the block is done, so no more than one
+        # block's text is held
+        self.terms = Counter()
+        self.text = []
+
+    def add_heading(self, level, text):
+        self.headings.append((level, text))
+
+    def add_text_node(self, text_node):
+        if text_node.text_type == TextType.IMAGE:
+            self.images.append(text_node.url)
+            return
+        if text_node.text_type == TextType.LINK:
+            self.links.append(text_node.url)
+        self.words += len(text_node.text.split())
+        self.text.append(text_node.text)
+
+    def end_block(self):
+        if self.text:
+            self.terms.update(count_terms(self.text))
+            self.text = []
+
+    def extend(self, other):
+        self.headings.extend(other.headings)
+        self.words += other.words
+        self.links.extend(other.links)
+        self.images.extend(other.images)
+        self.terms.update(other.terms)
+
+    def to_json(self):
+        return {
+            "headings": [list(heading) for heading in self.headings],
+            "words": self.words,
+            "links": self.links,
+            "images": self.images,
+            "terms": dict(self.terms),
+        }
+
+    def __repr__(self):
+        return f"Document({self.title}, headings: {len(self.headings)}, words: {self.words})"
+
+
+def markdown_to_html_nodes(markdown, cache=None):
+    return blocks_to_html_nodes(read_blocks(markdown.split("\n")), cache)
+
+
+def blocks_to_html_nodes(blocks, cache=None, doc=None):
+    for block_type, lines in blocks:
+        if doc is not None and doc.title is None:
+            doc.title = block_title(block_type, lines)
+        if cache is None:
+            node = lines_to_html_node(block_type, lines, doc)
+        else:
+            node = cache.lines_to_html_node(block_type, lines, doc)
+        if doc is not None:
+            doc.end_block()
+        yield node
+
+
+def write_markdown_html(markdown, write, cache=None):
+    write_blocks_html(read_blocks(markdown.split("\n")), write, cache)
+
+
+def write_blocks_html(blocks, write, cache=None, doc=None):
+    # same output as markdown_to_html_node(markdown).to_html(), but only one
+    # block's node tree is alive at a time
+    write("<div>")
+    for html_node in blocks_to_html_nodes(blocks, cache, doc):
+        html_node.write_html(write)
+    write("</div>")
+
+
+class BlockCache:
+    def __init__(self, max_size=1024):
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def clear(self):
+        self.entries.clear()
+
+    def block_to_html_node(self, block):
+        lines = block.split("\n")
+        return self.lines_to_html_node(lines_to_block_type(lines), lines)
+
+    def lines_to_html_node(self, block_type, lines, doc=None):
+        # blocks repeated across pages (footers, callouts, code samples) are
+        # parsed once and then served as pre-serialized html, along with the
+        # document metadata they contributed
+        key = (block_type, "\n".join(lines))
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.hits += 1
+            self.entries.move_to_end(key)
+        else:
+            self.misses += 1
+            block_doc = Document()
+            html = lines_to_html_node(block_type, lines, block_doc).to_html()
+            block_doc.end_block()
+            entry = (html, block_doc)
+            self.entries[key] = entry
+            if len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+        html, block_doc = entry
+        if doc is not None:
+            doc.extend(block_doc)
+        return RawNode(html)
+
+    def stats_line(self):
+        lookups = self.hits + self.misses
+        rate = self.hits / lookups * 100 if lookups else 0.0
+        return f"Block cache: {self.hits} hits, {self.misses} misses ({rate:.1f}% hit rate)"
+
+    def __repr__(self):
+        return f"BlockCache({len(self.entries)}/{self.max_size}, hits: {self.hits}, misses: {self.misses})"
+
+
+def block_to_html_node(block, block_type=None):
+    lines = block.split("\n")
+    if block_type is None:
+        block_type = lines_to_block_type(lines)
+    return lines_to_html_node(block_type, lines)
+
+
+def lines_to_html_node(block_type, lines, doc=None):
     if block_type == BlockType.PARAGRAPH:
-        return paragraph_to_html_node(block)
+        return paragraph_to_html_node(lines, doc)
     if block_type == BlockType.HEADING:
-        return heading_to_html_node(block)
+        return heading_to_html_node(lines, doc)
     if block_type == BlockType.CODE:
-        return code_to_html_node(block)
+        return code_to_html_node(lines)
     if block_type == BlockType.OLIST:
-        return olist_to_html_node(block)
+        return olist_to_html_node(lines, doc)
     if block_type == BlockType.ULIST:
-        return ulist_to_html_node(block)
+        return ulist_to_html_node(lines, doc)
     if block_type == BlockType.QUOTE:
-        return quote_to_html_node(block)
+        return quote_to_html_node(lines, doc)
     raise ValueError("invalid block type")
 
 
-def text_to_children(text):
+def text_to_children(text, doc=None):
     text_nodes = text_to_textnodes(text)
     children = []
     for text_node in text_nodes:
+        if doc is not None:
+            doc.add_text_node(text_node)
         html_node = text_node_to_html_node(text_node)
         children.append(html_node)
     return children
 
 
-def paragraph_to_html_node(block):
-    lines = block.split("\n")
+def paragraph_to_html_node(lines, doc=None):
     paragraph = " ".join(lines)
-    children = text_to_children(paragraph)
+    children = text_to_children(paragraph, doc)
     return ParentNode("p", children)
 
 
-def heading_to_html_node(block):
+def heading_to_html_node(lines, doc=None):
+    block = "\n".join(lines)
     level = 0
     for char in block:
         if char == "#":
@@ -104,48 +331,53 @@ def heading_to_html_node(block):
     if level + 1 >= len(block):
         raise ValueError(f"invalid heading level: {level}")
     text = block[level + 1 :]
-    children = text_to_children(text)
+    children = text_to_children(text, doc)
+    if doc is not None:
+        doc.add_heading(level, "".join(child.value for child in children))
     return ParentNode(f"h{level}", children)
 
 
-def code_to_html_node(block):
-    if not block.startswith("```") or not block.endswith("```"):
+def code_to_html_node(lines):
+    if len(lines) < 2 or not lines[0].startswith("```") or not opens_fence(lines[-1]):
         raise ValueError("invalid code block")
-    text = block[4:-3]
+    # the fence lines, language tag included, are not part of the code
+    text = "".join(line + "\n" for line in lines[1:-1])
+    lang = fence_language(lines[0])
+    html = highlight_code(text, lang)
+    if html is not None:
+        code = ParentNode("code", [RawNode(html)], {"class": f"language-{lang}"})
+        return ParentNode("pre", [code])
     raw_text_node = TextNode(text, TextType.TEXT)
     child = text_node_to_html_node(raw_text_node)
     code = ParentNode("code", [child])
     return ParentNode("pre", [code])
 
 
-def olist_to_html_node(block):
-    items = block.split("\n")
+def olist_to_html_node(lines, doc=None):
     html_items = []
-    for item in items:
+    for item in lines:
         parts = item.split(". ", 1)
         text = parts[1]
-        children = text_to_children(text)
+        children = text_to_children(text, doc)
         html_items.append(ParentNode("li", children))
     return ParentNode("ol", html_items)
 
 
-def ulist_to_html_node(block):
-    items = block.split("\n")
+def ulist_to_html_node(lines, doc=None):
     html_items = []
-    for item in items:
+    for item in lines:
         text = item[2:]
-        children = text_to_children(text)
+        children = text_to_children(text, doc)
         html_items.append(ParentNode("li", children))
     return ParentNode("ul", html_items)
 
 
-def quote_to_html_node(block):
-    lines = block.split("\n")
+def quote_to_html_node(lines, doc=None):
     new_lines = []
     for line in lines:
         if not line.startswith(">"):
             raise ValueError("invalid quote block")
         new_lines.append(line.lstrip(">").strip())
     content = " ".join(new_lines)
-    children = text_to_children(content)
+    children = text_to_children(content, doc)
     return ParentNode("blockquote", children)
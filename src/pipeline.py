@@ -0,0 +1,86 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+
+class PipelineStats:
+    def __init__(self):
+        # busy time of each stage, and how long rendering sat waiting on
+        # the stages around it
+        self.read = 0.0
+        self.render = 0.0
+        self.write = 0.0
+        self.waiting_for_read = 0.0
+        self.waiting_for_write = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, name, seconds):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + seconds)
+
+    def stats_line(self):
+        return (
+            f"Pipeline: read {self.read * 1000:.1f} ms, render {self.render * 1000:.1f} ms, "
+            f"write {self.write * 1000:.1f} ms; render blocked {self.waiting_for_read * 1000:.1f} ms "
+            f"on reads and {self.waiting_for_write * 1000:.1f} ms on writes"
+        )
+
+    def __repr__(self):
+        return f"PipelineStats(read: {self.read:.3f}, render: {self.render:.3f}, write: {self.write:.3f})"
+
+
+def run_pipeline(items, read, render, write, io_threads=4, depth=8, stats=None):
+    # read(item) and write(item, output) run on a pool of I/O threads while
+    # render(item, data) runs on the calling thread, in order; at most depth
+    # reads are prefetched and depth writes queued, so memory stays bounded
+    stats = stats if stats is not None else PipelineStats()
+    items = list(items)
+    write_slots = threading.BoundedSemaphore(depth)
+
+    def timed(fn, name):
+        def timed_fn(*args):
+            start = time.perf_counter()
+            try:
+                return fn(*args)
+            finally:
+                stats.add(name, time.perf_counter() - start)
+
+        return timed_fn
+
+    timed_read = timed(read, "read")
+    timed_write = timed(write, "write")
+    reads = deque()
+    writes = deque()
+    next_read = 0
+    with ThreadPoolExecutor(max_workers=io_threads) as pool:
+        try:
+            for item in items:
+                while next_read < len(items) and len(reads) < depth:
+                    reads.append(pool.submit(timed_read, items[next_read]))
+                    next_read += 1
+
+                start = time.perf_counter()
+                data = reads.popleft().result()
+                stats.add("waiting_for_read", time.perf_counter() - start)
+
+                start = time.perf_counter()
+                output = render(item, data)
+                stats.add("render", time.perf_counter() - start)
+
+                start = time.perf_counter()
+                write_slots.acquire()
+                stats.add("waiting_for_write", time.perf_counter() - start)
+                future = pool.submit(timed_write, item, output)
+                future.add_done_callback(lambda _: write_slots.release())
+                writes.append(future)
+                # a failed write stops the build as soon as it is noticed
+                while writes and writes[0].done():
+                    writes.popleft().result()
+            while writes:
+                writes.popleft().result()
+        except BaseException:
+            for future in reads:
+                future.cancel()
+            raise
+    return stats
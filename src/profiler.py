@@ -0,0 +1,213 @@
+import inspect
+import json
+import os
+import time
+from contextlib import contextmanager, nullcontext
+
+import markdown_blocks
+
+PAGE_PHASES = [
+    "read",
+    "title",
+    "split",
+    "type",
+    "inline",
+    "tree",
+    "highlight",
+    "serialize",
+    "template",
+    "write",
+]
+BUILD_PHASES = ["walk", "static", "images", "assets", "index", "search", "links", "compress", "manifest"]
+
+# functions inside the parser that get their own phase while profiling;
+# they are swapped for timed wrappers so a normal build pays nothing
+INSTRUMENTED = {
+    "split_blocks": "split",
+    "lines_to_block_type": "type",
+    "text_to_textnodes": "inline",
+    "lines_to_html_node": "tree",
+    "text_node_to_html_node": "tree",
+    "highlight_code": "highlight",
+}
+
+_active = None
+_originals = {}
+
+
+def active():
+    return _active
+
+
+def phase(name):
+    if _active is None:
+        return nullcontext()
+    return _active.phase(name)
+
+
+def page(src_path):
+    if _active is None:
+        return nullcontext()
+    return _active.page(src_path)
+
+
+def timed(fn, name):
+    if _active is None:
+        return fn
+    return _active.wrap(fn, name)
+
+
+def timed_iter(iterable, name):
+    if _active is None:
+        return iterable
+    return _active.iterate(iterable, name)
+
+
+def start():
+    global _active
+    _active = Profiler()
+    for attr, name in INSTRUMENTED.items():
+        if attr not in _originals:
+            _originals[attr] = getattr(markdown_blocks, attr)
+        fn = _originals[attr]
+        if inspect.isgeneratorfunction(fn):
+            setattr(markdown_blocks, attr, _active.wrap_generator(fn, name))
+        else:
+            setattr(markdown_blocks, attr, _active.wrap(fn, name))
+    return _active
+
+
+def stop():
+    global _active
+    for attr, fn in _originals.items():
+        setattr(markdown_blocks, attr, fn)
+    _originals.clear()
+    profiler, _active = _active, None
+    return profiler
+
+
+class Profiler:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.wall = None
+        self.totals = {}
+        self.pages = []
+        # open phases as [name, start, time spent in nested phases]
+        self._stack = []
+        self._page = None
+
+    def _enter(self, name):
+        self._stack.append([name, time.perf_counter(), 0.0])
+
+    def _exit(self):
+        name, start, nested = self._stack.pop()
+        elapsed = time.perf_counter() - start
+        # phases are exclusive: time in a nested phase is only counted there
+        self._add(name, elapsed - nested)
+        if self._stack:
+            self._stack[-1][2] += elapsed
+
+    def _add(self, name, seconds):
+        target = self._page["phases"] if self._page is not None else self.totals
+        target[name] = target.get(name, 0.0) + seconds
+
+    @contextmanager
+    def phase(self, name):
+        self._enter(name)
+        try:
+            yield
+        finally:
+            self._exit()
+
+    def wrap(self, fn, name):
+        enter = self._enter
+        exit = self._exit
+
+        def timed_fn(*args, **kwargs):
+            enter(name)
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                exit()
+
+        return timed_fn
+
+    def wrap_generator(self, fn, name):
+        # a generator does its work while being iterated, not when called
+        def timed_fn(*args, **kwargs):
+            return self.iterate(fn(*args, **kwargs), name)
+
+        return timed_fn
+
+    def iterate(self, iterable, name):
+        enter = self._enter
+        exit = self._exit
+        iterator = iter(iterable)
+        while True:
+            enter(name)
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                exit()
+            yield item
+
+    @contextmanager
+    def page(self, src_path):
+        self._page = {"page": src_path, "total": 0.0, "phases": {}}
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._page["total"] = time.perf_counter() - start
+            self.add_page(self._page)
+            self._page = None
+
+    def add_page(self, record):
+        self.pages.append(record)
+        for name, seconds in record["phases"].items():
+            self.totals[name] = self.totals.get(name, 0.0) + seconds
+
+    def finish(self):
+        self.wall = time.perf_counter() - self.started
+
+    def report(self, slowest=10):
+        lines = []
+        wall = self.wall if self.wall is not None else time.perf_counter() - self.started
+        lines.append(f"Profile: {len(self.pages)} pages in {wall * 1000:.1f} ms wall time")
+        lines.append(f"  {'phase':<10} {'total ms':>10} {'per page':>10} {'share':>7}")
+        measured = sum(self.totals.values()) or 1.0
+        for name in BUILD_PHASES + PAGE_PHASES:
+            if name not in self.totals:
+                continue
+            seconds = self.totals[name]
+            per_page = "-"
+            if self.pages and name in PAGE_PHASES:
+                per_page = f"{seconds / len(self.pages) * 1000:.3f}"
+            lines.append(
+                f"  {name:<10} {seconds * 1000:10.2f} {per_page:>10} {seconds / measured * 100:6.1f}%"
+            )
+        if self.pages:
+            lines.append("  slowest pages:")
+            for record in sorted(self.pages, key=lambda r: r["total"], reverse=True)[:slowest]:
+                top = max(record["phases"].items(), key=lambda item: item[1], default=("-", 0))
+                lines.append(
+                    f"  {record['total'] * 1000:10.2f} ms  {record['page']}  (mostly {top[0]})"
+                )
+        return "\n".join(lines)
+
+    def to_json(self):
+        return {
+            "version": 1,
+            "wall": self.wall,
+            "phases": dict(sorted(self.totals.items())),
+            "pages": sorted(self.pages, key=lambda r: r["page"]),
+        }
+
+    def save(self, path):
+        dirname = os.path.dirname(path)
+        if dirname and not os.path.exists(dirname):
+            os.makedirs(dirname)
+        with open(path, "w") as f:
+            json.dump(self.to_json(), f, indent=1, sort_keys=True)
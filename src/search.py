@@ -0,0 +1,209 @@
+import hashlib
+import json
+import os
+import re
+from collections import Counter
+
+from site_index import absolute_url, page_url
+
+SEARCH_DIR = "search"
+INDEX_NAME = "index.json"
+SEARCH_VERSION = 2
+TERM_PATTERN = re.compile(r"\w\w+")
+SHARD_PATTERN = re.compile(r"[a-z0-9]{2}")
+
+
+def tokenize(text):
+    return TERM_PATTERN.findall(text.lower())
+
+
+def count_terms(texts):
+    # one pass over a block's text is much cheaper than one per text node
+    return Counter(tokenize(" ".join(texts)))
+
+
+def shard_key(term):
+    # terms are sharded by their first two characters, so a browser only
+    # fetches the postings for what is being typed
+    prefix = term[:2]
+    return prefix if SHARD_PATTERN.fullmatch(prefix) else "_"
+
+
+def shard_digests(terms):
+    # a digest of the page's postings in each shard it appears in, so an
+    # edit only dirties the shards whose terms or counts actually moved
+    shards = {}
+    for term, count in terms.items():
+        shards.setdefault(shard_key(term), []).append([term, count])
+    return {
+        key: hashlib.sha256(json.dumps(sorted(items)).encode()).hexdigest()[:16]
+        for key, items in shards.items()
+    }
+
+
+def shard_path(dest_dir, key):
+    return os.path.join(dest_dir, SEARCH_DIR, key + ".json")
+
+
+def index_paths(state, dest_dir):
+    # every file the index described by state consists of
+    paths = [shard_path(dest_dir, key) for key in state.get("shards", [])]
+    if state:
+        paths.append(os.path.join(dest_dir, SEARCH_DIR, INDEX_NAME))
+    return paths
+
+
+def read_shard(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def build_search_index(
+    meta, state, dest_dir, basepath="/", load_terms=None, changed=None, cache=None
+):
+    # returns ({path: contents}, shard files to remove, new state). pages
+    # rendered this build carry their term counts, the others are only
+    # known by id and per-shard digest: a changed shard is updated from its
+    # file, dropping the postings of rendered and removed pages and adding
+    # the new ones. load_terms(src_path) is used for pages without terms in
+    # a shard that has to be written from scratch. with changed, only those
+    # source paths are looked at. cache, when given, keeps the postings of
+    # every shard read or written here between calls, so a long-running
+    # process that alone writes dest_dir does not parse its shards again
+    if state.get("version") == SEARCH_VERSION:
+        pages = dict(state["pages"])
+        shards = dict(state["shards"])
+        next_id = state["next_id"]
+    else:
+        pages = {}
+        shards = {}
+        next_id = 0
+        changed = None
+    if changed is None:
+        changed = meta.keys() | pages.keys()
+    old_shards = set(shards)
+    terms = {}
+
+    def page_terms(src_path):
+        if src_path not in terms:
+            page = meta[src_path]
+            if "terms" in page:
+                terms[src_path] = page["terms"]
+            elif load_terms is None:
+                raise ValueError(f"invalid search state: no terms for {src_path}")
+            else:
+                terms[src_path] = load_terms(src_path)
+        return terms[src_path]
+
+    # shards counts the pages with postings in each shard
+    def release(entry):
+        for key in entry["shards"]:
+            shards[key] -= 1
+            if not shards[key]:
+                del shards[key]
+
+    dirty = set()
+    dropped = set()
+    index_changed = False
+    for src_path in sorted(changed):
+        old_entry = pages.get(src_path)
+        page = meta.get(src_path)
+        if page is None:
+            if old_entry is not None:
+                del pages[src_path]
+                release(old_entry)
+                dropped.add(old_entry["id"])
+                dirty.update(old_entry["shards"])
+                index_changed = True
+            continue
+        if old_entry is not None and "terms" not in page:
+            continue
+        entry = {
+            "shards": shard_digests(page_terms(src_path)),
+            "url": absolute_url("", basepath, page_url(page["dest"], dest_dir)),
+            "title": page["title"],
+        }
+        if old_entry is not None:
+            # ids stay put so unchanged shards stay valid
+            entry["id"] = old_entry["id"]
+            release(old_entry)
+            dropped.add(entry["id"])
+            dirty.update(
+                key
+                for key in old_entry["shards"].keys() | entry["shards"].keys()
+                if old_entry["shards"].get(key) != entry["shards"].get(key)
+            )
+            if (old_entry["url"], old_entry["title"]) != (entry["url"], entry["title"]):
+                index_changed = True
+        else:
+            entry["id"] = next_id
+            next_id += 1
+            dirty.update(entry["shards"])
+            index_changed = True
+        for key in entry["shards"]:
+            shards[key] = shards.get(key, 0) + 1
+        pages[src_path] = entry
+    fresh = set(terms)
+
+    postings = {}
+    rebuilt = set()
+    for key in sorted(shards):
+        if key in dirty:
+            if cache is not None and key in cache:
+                shard = cache[key]
+            else:
+                shard = read_shard(shard_path(dest_dir, key))
+        elif os.path.exists(shard_path(dest_dir, key)):
+            continue
+        else:
+            shard = None
+        if shard is None:
+            # a wiped output directory needs the shard again, from every
+            # page in it
+            rebuilt.add(key)
+            postings[key] = {}
+        else:
+            postings[key] = {
+                term: [posting for posting in shard[term] if posting[0] not in dropped]
+                for term in shard
+            }
+
+    adding = pages if rebuilt else {src_path: pages[src_path] for src_path in fresh}
+    for src_path, entry in adding.items():
+        keys = {
+            key
+            for key in entry["shards"]
+            if key in rebuilt or (key in postings and src_path in fresh)
+        }
+        if not keys:
+            continue
+        for term, count in page_terms(src_path).items():
+            key = shard_key(term)
+            if key in keys:
+                postings[key].setdefault(term, []).append([entry["id"], count])
+
+    outputs = {}
+    for key, shard in postings.items():
+        # postings are sorted by page id, and keys by term, so an
+        # unchanged shard is written byte for byte the same
+        shard = {term: sorted(shard[term]) for term in sorted(shard) if shard[term]}
+        outputs[shard_path(dest_dir, key)] = json.dumps(shard, separators=(",", ":"))
+        if cache is not None:
+            cache[key] = shard
+    index_path = os.path.join(dest_dir, SEARCH_DIR, INDEX_NAME)
+    if index_changed or old_shards != set(shards) or not os.path.exists(index_path):
+        index = {
+            "version": SEARCH_VERSION,
+            "shards": sorted(shards),
+            "pages": {str(entry["id"]): [entry["url"], entry["title"]] for entry in pages.values()},
+        }
+        outputs[index_path] = json.dumps(index, separators=(",", ":"), sort_keys=True)
+    removed = [shard_path(dest_dir, key) for key in state.get("shards", ()) if key not in shards]
+    if cache is not None:
+        for key in set(cache) - set(shards):
+            del cache[key]
+    new_state = {"version": SEARCH_VERSION, "pages": pages, "next_id": next_id, "shards": shards}
+    return outputs, removed, new_state
@@ -0,0 +1,204 @@
+import calendar
+import os
+import re
+import time
+
+from frontmatter import DATE_FORMAT
+from htmlnode import LeafNode, ParentNode, escape_attribute, escape_text
+
+SITEMAP_NAME = "sitemap.xml"
+FEED_NAME = "feed.xml"
+TAGS_DIR = "tags"
+SLUG_PATTERN = re.compile(r"[^a-z0-9]+")
+
+
+def page_url(dest_path, dest_dir):
+    rel_path = os.path.relpath(dest_path, dest_dir).replace(os.sep, "/")
+    if rel_path == "index.html":
+        return "/"
+    if rel_path.endswith("/index.html"):
+        return "/" + rel_path[: -len("index.html")]
+    return "/" + rel_path
+
+
+def url_dest_path(url, dest_dir):
+    path = os.path.join(dest_dir, *url.strip("/").split("/"))
+    if url.endswith("/"):
+        path = os.path.join(path, "index.html")
+    return os.path.normpath(path)
+
+
+def tag_slug(tag):
+    return SLUG_PATTERN.sub("-", tag.lower()).strip("-")
+
+
+def page_tags(page):
+    tags = page.get("front_matter", {}).get("tags", [])
+    return [tags] if isinstance(tags, str) else tags
+
+
+def listing_urls(page, dest_dir, feed_section="blog"):
+    # the listings a page shows up in; a page inside the section directory
+    # counts too, because its own index page replaces the section listing
+    urls = {f"/{TAGS_DIR}/{tag_slug(tag)}/" for tag in page_tags(page)}
+    if page["dest"].startswith(os.path.join(dest_dir, feed_section, "")):
+        urls.add(f"/{feed_section}/")
+    return urls
+
+
+def absolute_url(site_url, basepath, url):
+    # with an empty site url this is only relative to the host, which is
+    # fine for pages but not for sitemaps and feeds
+    return site_url.rstrip("/") + basepath.rstrip("/") + url
+
+
+def iso_time(timestamp):
+    return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(timestamp))
+
+
+def site_records(meta, dest_dir):
+    records = []
+    for src_path, page in meta.items():
+        front_matter = page.get("front_matter", {})
+        record = dict(page)
+        record["src"] = src_path
+        record["url"] = page_url(page["dest"], dest_dir)
+        # a date in the front matter wins over the file's mtime, which
+        # changes on every checkout
+        if "date" in front_matter:
+            record["mtime"] = calendar.timegm(time.strptime(front_matter["date"], DATE_FORMAT))
+        record["tags"] = page_tags(page)
+        records.append(record)
+    records.sort(key=lambda record: record["url"])
+    return records
+
+
+def newest_first(records):
+    return sorted(records, key=lambda record: (-record["mtime"], record["url"]))
+
+
+def listing_html(heading, records):
+    items = [
+        ParentNode("li", [LeafNode("a", record["title"], {"href": record["url"]})])
+        for record in newest_first(records)
+    ]
+    children = [LeafNode("h1", heading)]
+    if items:
+        children.append(ParentNode("ul", items))
+    return ParentNode("div", children).to_html()
+
+
+def sitemap_xml(records, site_url, basepath):
+    lines = [
+        '<?xml version="1.0" encoding="UTF-8"?>',
+        '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">',
+    ]
+    for record in records:
+        loc = escape_text(absolute_url(site_url, basepath, record["url"]))
+        lastmod = time.strftime("%Y-%m-%d", time.gmtime(record["mtime"]))
+        lines.append(f"  <url><loc>{loc}</loc><lastmod>{lastmod}</lastmod></url>")
+    lines.append("</urlset>")
+    return "\n".join(lines) + "\n"
+
+
+def feed_xml(title, section_url, records, site_url, basepath):
+    section = absolute_url(site_url, basepath, section_url)
+    feed = absolute_url(site_url, basepath, section_url + FEED_NAME)
+    updated = max((record["mtime"] for record in records), default=0)
+    lines = [
+        '<?xml version="1.0" encoding="utf-8"?>',
+        '<feed xmlns="http://www.w3.org/2005/Atom">',
+        f"  <title>{escape_text(title)}</title>",
+        f'  <link href="{escape_attribute(section)}"/>',
+        f'  <link rel="self" href="{escape_attribute(feed)}"/>',
+        f"  <id>{escape_text(section)}</id>",
+        f"  <updated>{iso_time(updated)}</updated>",
+    ]
+    for record in newest_first(records):
+        url = absolute_url(site_url, basepath, record["url"])
+        lines.extend(
+            [
+                "  <entry>",
+                f"    <title>{escape_text(record['title'])}</title>",
+                f'    <link href="{escape_attribute(url)}"/>',
+                f"    <id>{escape_text(url)}</id>",
+                f"    <updated>{iso_time(record['mtime'])}</updated>",
+                "  </entry>",
+            ]
+        )
+    lines.append("</feed>")
+    return "\n".join(lines) + "\n"
+
+
+def build_site_index(meta, template, dest_dir, site_url="", feed_section="blog", only=None):
+    # everything here comes from the metadata collected while pages were
+    # rendered, so no markdown is read again; returns {path: contents}.
+    # sitemaps and atom feeds must use absolute urls, so without a site url
+    # only the listing pages are written. with only, just the listings at
+    # those urls and their feeds are built, and the sitemap is left alone
+    basepath = template.basepath
+    if only is not None:
+        section_dir = os.path.join(dest_dir, feed_section, "")
+        in_section = f"/{feed_section}/" in only
+        meta = {
+            src_path: page
+            for src_path, page in meta.items()
+            if in_section and page["dest"].startswith(section_dir)
+            or any(f"/{TAGS_DIR}/{tag_slug(tag)}/" in only for tag in page_tags(page))
+        }
+    records = site_records(meta, dest_dir)
+    page_urls = {record["url"] for record in records}
+    outputs = {}
+    listings = []
+
+    section_url = f"/{feed_section}/"
+    section_records = [
+        record
+        for record in records
+        if record["url"].startswith(section_url) and record["url"] != section_url
+    ]
+    if section_records:
+        heading = feed_section.capitalize()
+        if section_url not in page_urls:
+            listings.append((section_url, heading, section_records))
+        if site_url and (only is None or section_url in only):
+            outputs[url_dest_path(section_url + FEED_NAME, dest_dir)] = feed_xml(
+                heading, section_url, section_records, site_url, basepath
+            )
+
+    # tags that only differ in case or punctuation share a page, named
+    # after the first spelling seen
+    tags = {}
+    for record in records:
+        for tag in record["tags"]:
+            name, tagged = tags.setdefault(tag_slug(tag), (tag, []))
+            if record not in tagged:
+                tagged.append(record)
+    for slug, (name, tagged) in sorted(tags.items()):
+        listings.append((f"/{TAGS_DIR}/{slug}/", f"Tagged {name}", tagged))
+
+    listed = []
+    for url, heading, listed_records in listings:
+        if only is not None and url not in only:
+            continue
+        values = template.blank_values()
+        values["Title"] = escape_text(heading)
+        values["Content"] = listing_html(heading, listed_records)
+        outputs[url_dest_path(url, dest_dir)] = template.render(values)
+        listed.append({"url": url, "mtime": max(record["mtime"] for record in listed_records)})
+
+    if site_url and only is None:
+        sitemap_records = sorted(records + listed, key=lambda record: record["url"])
+        outputs[os.path.join(dest_dir, SITEMAP_NAME)] = sitemap_xml(
+            sitemap_records, site_url, basepath
+        )
+    return outputs
+
+
+def write_site_index(outputs):
+    for path, contents in outputs.items():
+        dirname = os.path.dirname(path)
+        if dirname and not os.path.exists(dirname):
+            os.makedirs(dirname)
+        with open(path, "w") as f:
+            f.write(contents)
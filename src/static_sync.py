@@ -0,0 +1,148 @@
+import os
+import shutil
+import sys
+
+from manifest import hash_file, stale_outputs
+
+# ioctl request that asks the filesystem to share src's extents with dest
+# (btrfs, XFS, bcachefs); see ioctl_ficlone(2)
+FICLONE = 0x40049409
+
+
+def collect_files(src_dir, dest_dir):
+    files = []
+    for item in sorted(os.listdir(src_dir)):
+        src_path = os.path.join(src_dir, item)
+        dest_path = os.path.join(dest_dir, item)
+
+        if os.path.isfile(src_path):
+            files.append((src_path, dest_path))
+        else:
+            files.extend(collect_files(src_path, dest_path))
+    return files
+
+
+def sync_static(src_dir, dest_dir, manifest, checksum=False, hardlink=False):
+    # only files whose size or mtime changed (or, with checksum, whose
+    # content changed) are copied; outputs of assets that disappeared from
+    # src_dir are removed, everything else in dest_dir is left alone
+    assets = {}
+    copied = {}
+    unchanged = 0
+    for src_path, dest_path in collect_files(src_dir, dest_dir):
+        st = os.stat(src_path)
+        entry = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "dest": dest_path}
+        old_entry = manifest.assets.get(src_path)
+
+        if checksum:
+            entry["hash"] = hash_file(src_path)
+            fresh = (
+                old_entry is not None
+                and old_entry.get("hash") == entry["hash"]
+                and old_entry["dest"] == dest_path
+                and dest_matches(dest_path, st.st_size)
+            )
+        else:
+            fresh = (
+                old_entry is not None
+                and old_entry.get("size") == st.st_size
+                and old_entry.get("mtime_ns") == st.st_mtime_ns
+                and old_entry["dest"] == dest_path
+                and dest_matches(dest_path, st.st_size)
+            )
+            if fresh and "hash" in old_entry:
+                entry["hash"] = old_entry["hash"]
+
+        assets[src_path] = entry
+        if fresh:
+            unchanged += 1
+            continue
+
+        dirname = os.path.dirname(dest_path)
+        if dirname and not os.path.exists(dirname):
+            os.makedirs(dirname)
+        method = copy_file(src_path, dest_path, hardlink)
+        copied[method] = copied.get(method, 0) + 1
+        print(f"Copying asset {src_path} to {dest_path} ({method})")
+
+    removed = stale_outputs(manifest.assets, assets)
+    for path in removed:
+        if os.path.isfile(path):
+            print(f"Removing stale asset {path}")
+            os.remove(path)
+    manifest.assets = assets
+
+    methods = ", ".join(f"{count} by {method}" for method, count in sorted(copied.items()))
+    print(
+        f"Synced static: {sum(copied.values())} copied{f' ({methods})' if methods else ''}, "
+        f"{unchanged} unchanged, {len(removed)} removed"
+    )
+
+
+def dest_matches(dest_path, size):
+    try:
+        return os.stat(dest_path).st_size == size
+    except OSError:
+        return False
+
+
+def copy_file(src_path, dest_path, hardlink=False):
+    # written next to the destination and renamed over it, so a reader
+    # (or a hardlinked source) never sees a half-written file
+    tmp_path = dest_path + ".tmp"
+    if os.path.lexists(tmp_path):
+        os.remove(tmp_path)
+
+    if hardlink:
+        try:
+            os.link(src_path, tmp_path)
+            os.replace(tmp_path, dest_path)
+            return "hardlink"
+        except OSError:
+            # different filesystem, or links not supported; copy instead
+            pass
+
+    with open(src_path, "rb") as src, open(tmp_path, "wb") as dest:
+        method = clone_file(src, dest) or copy_file_range(src, dest)
+        if method is None:
+            shutil.copyfileobj(src, dest, 1 << 20)
+            method = "copy"
+    shutil.copymode(src_path, tmp_path)
+    os.replace(tmp_path, dest_path)
+    return method
+
+
+def clone_file(src, dest):
+    if not sys.platform.startswith("linux"):
+        return None
+    import fcntl
+
+    try:
+        fcntl.ioctl(dest.fileno(), FICLONE, src.fileno())
+    except OSError:
+        return None
+    return "reflink"
+
+
+def copy_file_range(src, dest):
+    if not hasattr(os, "copy_file_range"):
+        return None
+    size = os.fstat(src.fileno()).st_size
+    copied = 0
+    try:
+        while copied < size:
+            n = os.copy_file_range(src.fileno(), dest.fileno(), size - copied)
+            if n == 0:
+                break
+            copied += n
+    except OSError:
+        # unsupported between these filesystems; start over with a plain copy
+        src.seek(0)
+        dest.seek(0)
+        dest.truncate()
+        return None
+    if copied < size:
+        src.seek(copied)
+        dest.seek(copied)
+        return None
+    return "copy_file_range"
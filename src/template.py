@@ -0,0 +1,83 @@
+import re
+
+from assets import rewrite_asset_urls
+
+SLOT_PATTERN = re.compile(r"\{\{ (\w+) \}\}")
+SRCSET_PATTERN = re.compile(r'srcset="([^"]*)"')
+
+
+def rewrite_basepath(html, basepath):
+    if basepath == "/":
+        return html
+    html = html.replace('href="/', f'href="{basepath}')
+    html = html.replace('src="/', f'src="{basepath}')
+    if 'srcset="' in html:
+        html = SRCSET_PATTERN.sub(lambda match: rewrite_srcset(match, basepath), html)
+    return html
+
+
+def rewrite_srcset(match, basepath):
+    # every candidate in a srcset is a url of its own
+    candidates = []
+    for candidate in match.group(1).split(", "):
+        if candidate.startswith("/"):
+            candidate = basepath + candidate[1:]
+        candidates.append(candidate)
+    return f'srcset="{", ".join(candidates)}"'
+
+
+class Template:
+    def __init__(self, source, basepath="/", path=None):
+        self.path = path
+        self.basepath = basepath
+        # the template itself is rewritten once here; only slot values are
+        # rewritten per page
+        source = rewrite_basepath(rewrite_asset_urls(source), basepath)
+        self.segments = []
+        self.slots = []
+        start = 0
+        for match in SLOT_PATTERN.finditer(source):
+            self.segments.append(source[start : match.start()])
+            self.slots.append((match.group(1), match.group(0)))
+            start = match.end()
+        self.segments.append(source[start:])
+
+    @classmethod
+    def load(cls, path, basepath="/"):
+        with open(path) as f:
+            return cls(f.read(), basepath, path)
+
+    def blank_values(self):
+        # every slot as an empty string; pages and listings start from this
+        # so a front matter key one page lacks does not show up as {{ key }}
+        return {name: "" for name, _ in self.slots}
+
+    def render(self, values):
+        parts = []
+        self.write(parts.append, values)
+        return "".join(parts)
+
+    def write(self, write, values):
+        # a slot value is either a string or a callable that streams the
+        # slot's content into the write function it is given
+        write(self.segments[0])
+        for (name, marker), segment in zip(self.slots, self.segments[1:]):
+            value = values.get(name)
+            if value is None:
+                # unknown slots are left in place, like the old str.replace did
+                write(marker)
+            elif callable(value):
+                value(self._rewriting_writer(write))
+            else:
+                write(rewrite_basepath(value, self.basepath))
+            write(segment)
+
+    def _rewriting_writer(self, write):
+        if self.basepath == "/":
+            return write
+        basepath = self.basepath
+        return lambda fragment: write(rewrite_basepath(fragment, basepath))
+
+    def __repr__(self):
+        names = [name for name, _ in self.slots]
+        return f"Template({self.path}, {self.basepath}, slots: {names})"
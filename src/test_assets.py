@@ -0,0 +1,121 @@
+import gzip
+import os
+import tempfile
+import unittest
+
+import assets
+import images
+from manifest import Manifest
+from template import Template
+from textnode import TextNode, TextType, text_node_to_html_node
+
+
+class TestFingerprint(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.src = os.path.join(self.tmp.name, "static")
+        self.dest = os.path.join(self.tmp.name, "docs")
+        self.manifest = Manifest(os.path.join(self.tmp.name, "manifest.json"))
+        os.makedirs(os.path.join(self.src, "images"))
+        self.write("index.css", "body {}")
+        self.write(os.path.join("images", "a.png"), "png")
+        self.write("robots.txt", "User-agent: *")
+
+    def tearDown(self):
+        assets.set_table({})
+        self.tmp.cleanup()
+
+    def write(self, name, text):
+        with open(os.path.join(self.src, name), "w") as f:
+            f.write(text)
+
+    def test_fingerprint_assets(self):
+        table = assets.fingerprint_assets(self.src, self.dest, self.manifest)
+        self.assertEqual(sorted(table), ["/images/a.png", "/index.css"])
+        css = table["/index.css"]
+        self.assertRegex(css, r"^/index\.[0-9a-f]{10}\.css$")
+        with open(os.path.join(self.dest, css[1:])) as f:
+            self.assertEqual(f.read(), "body {}")
+
+        # a changed asset gets a new name and the old copy goes away
+        self.write("index.css", "body { color: red }")
+        os.utime(os.path.join(self.src, "index.css"), ns=(1, 1))
+        changed = assets.fingerprint_assets(self.src, self.dest, self.manifest)
+        self.assertNotEqual(changed["/index.css"], css)
+        self.assertFalse(os.path.exists(os.path.join(self.dest, css[1:])))
+
+    def test_references_are_rewritten(self):
+        table = assets.fingerprint_assets(self.src, self.dest, self.manifest)
+        template = Template('<link href="/index.css"><a href="/blog/">{{ Content }}</a>', "/site/")
+        self.assertEqual(
+            template.render({"Content": ""}),
+            f'<link href="/site{table["/index.css"]}"><a href="/site/blog/"></a>',
+        )
+        node = text_node_to_html_node(TextNode("a", TextType.IMAGE, "/images/a.png"))
+        self.assertEqual(node.props["src"], table["/images/a.png"])
+        node = text_node_to_html_node(TextNode("home", TextType.LINK, "/"))
+        self.assertEqual(node.props["href"], "/")
+
+    @unittest.skipIf(images.PIL is None, "pillow is not installed")
+    def test_variants_are_fingerprinted(self):
+        from PIL import Image
+
+        images.configure(True, os.path.join(self.tmp.name, "cache"))
+        Image.new("RGB", (1000, 500), "red").save(os.path.join(self.src, "images", "b.png"))
+        try:
+            images.optimize_images(self.src, self.dest, self.manifest)
+            table = assets.fingerprint_assets(self.src, self.dest, self.manifest)
+            srcset = images.image_attributes("/images/b.png")["srcset"]
+        finally:
+            images.configure()
+            images.set_table({})
+        urls = [candidate.split()[0] for candidate in srcset.split(", ")]
+        self.assertEqual(len(urls), 3)
+        for url in urls:
+            self.assertRegex(url, r"^/images/b-\d+w\.[0-9a-f]{10}\.webp$")
+            self.assertTrue(os.path.exists(os.path.join(self.dest, url[1:])))
+        self.assertRegex(table["/images/b.png"], r"^/images/b\.[0-9a-f]{10}\.png$")
+
+    def test_no_table(self):
+        html = '<link href="/index.css">'
+        self.assertEqual(assets.rewrite_asset_urls(html), html)
+        self.assertEqual(assets.asset_url("/index.css"), "/index.css")
+
+
+class TestCompress(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dest = self.tmp.name
+        self.manifest = Manifest(os.path.join(self.tmp.name, "manifest.json"))
+        self.page = os.path.join(self.dest, "index.html")
+        with open(self.page, "w") as f:
+            f.write("<p>hello</p>" * 100)
+        with open(os.path.join(self.dest, "a.png"), "wb") as f:
+            f.write(b"png")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_compress_outputs(self):
+        assets.compress_outputs(self.dest, self.manifest)
+        with gzip.open(self.page + ".gz", "rt") as f:
+            self.assertEqual(f.read(), "<p>hello</p>" * 100)
+        self.assertFalse(os.path.exists(os.path.join(self.dest, "a.png.gz")))
+        self.assertEqual(os.path.exists(self.page + ".br"), assets.brotli is not None)
+
+        # unchanged files keep their siblings
+        mtime = os.stat(self.page + ".gz").st_mtime_ns
+        os.utime(self.page + ".gz", ns=(1, 1))
+        assets.compress_outputs(self.dest, self.manifest)
+        self.assertNotEqual(os.stat(self.page + ".gz").st_mtime_ns, mtime)
+        self.assertEqual(os.stat(self.page + ".gz").st_mtime_ns, 1)
+
+        # siblings of removed outputs are removed too
+        os.remove(self.page)
+        assets.compress_outputs(self.dest, self.manifest)
+        self.assertFalse(os.path.exists(self.page + ".gz"))
+        self.assertEqual(self.manifest.compressed, {})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,53 @@
+import os
+import re
+import tempfile
+import unittest
+
+from bench import CorpusShape, generate_corpus, page_path, synthetic_pages
+from markdown_blocks import markdown_to_html_node
+
+
+class TestCorpus(unittest.TestCase):
+    def test_pages_are_deterministic(self):
+        shape = CorpusShape(pages=5, blocks=6)
+        self.assertEqual(list(synthetic_pages(shape)), list(synthetic_pages(shape)))
+        other = CorpusShape(pages=5, blocks=6, seed=2)
+        self.assertNotEqual(list(synthetic_pages(shape)), list(synthetic_pages(other)))
+
+    def test_page_path_depth(self):
+        self.assertEqual(page_path(7, 0), os.path.join("page7", "index.md"))
+        self.assertEqual(
+            page_path(123, 2), os.path.join("section2", "section1", "page123", "index.md")
+        )
+
+    def test_links_point_at_pages(self):
+        shape = CorpusShape(pages=120, depth=2, blocks=20, inline_density=0.8)
+        pages = dict(synthetic_pages(shape))
+        links = set()
+        for markdown in pages.values():
+            links.update(re.findall(r"[^!]\[[^\]]*\]\(([^)]*)\)", markdown))
+        self.assertGreater(len(links), 10)
+        for link in links:
+            self.assertIn(os.path.join(*link.strip("/").split("/"), "index.md"), pages)
+
+    def test_pages_parse(self):
+        shape = CorpusShape(pages=10, blocks=20, inline_density=0.8, images=2)
+        for _, markdown in synthetic_pages(shape):
+            self.assertTrue(markdown.startswith("# Page "))
+            markdown_to_html_node(markdown).to_html()
+
+    def test_generate_corpus(self):
+        shape = CorpusShape(pages=12, depth=1, blocks=4)
+        with tempfile.TemporaryDirectory() as root:
+            size = generate_corpus(root, shape)
+            self.assertGreater(size, 0)
+            pages = []
+            for dirpath, _, filenames in os.walk(os.path.join(root, "content")):
+                pages.extend(name for name in filenames if name.endswith(".md"))
+            self.assertEqual(len(pages), 12)
+            self.assertTrue(os.path.isfile(os.path.join(root, "template.html")))
+            self.assertTrue(os.path.isfile(os.path.join(root, "static", "images", "img0.png")))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,132 @@
+import http.client
+import os
+import sys
+import tempfile
+import unittest
+
+from devserver import (
+    LIVE_RELOAD_PATH,
+    LIVE_RELOAD_SCRIPT,
+    DevServer,
+    InotifyWatcher,
+    PollingWatcher,
+    is_ignored,
+)
+
+
+class TestWatchers(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.content = os.path.join(self.tmp.name, "content")
+        os.makedirs(self.content)
+        self.page = os.path.join(self.content, "index.md")
+        self.template = os.path.join(self.tmp.name, "template.html")
+        for path in (self.page, self.template):
+            with open(path, "w") as f:
+                f.write("# Hi")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def check_watcher(self, watcher):
+        try:
+            self.assertEqual(watcher.wait(0), set())
+            # editor swap and backup files next to the page are not reported
+            for name in (".index.md.swp", "index.md~", "4913"):
+                with open(os.path.join(self.content, name), "w") as f:
+                    f.write("x")
+            with open(self.page, "a") as f:
+                f.write("\n\nmore")
+            self.assertEqual(watcher.wait(2), {os.path.normpath(self.page)})
+
+            with open(self.template, "a") as f:
+                f.write("<p></p>")
+            # other files next to the template are not reported
+            with open(os.path.join(self.tmp.name, "other.txt"), "w") as f:
+                f.write("x")
+            self.assertEqual(watcher.wait(2), {os.path.normpath(self.template)})
+
+            nested = os.path.join(self.content, "blog", "post")
+            os.makedirs(nested)
+            post = os.path.join(nested, "index.md")
+            with open(post, "w") as f:
+                f.write("# Post")
+            changed = set()
+            while os.path.normpath(post) not in changed:
+                found = watcher.wait(2)
+                self.assertTrue(found)
+                changed |= found
+        finally:
+            watcher.close()
+
+    def test_polling_watcher(self):
+        self.check_watcher(PollingWatcher([self.content], [self.template], 0.01))
+
+    @unittest.skipUnless(sys.platform.startswith("linux"), "inotify is Linux only")
+    def test_inotify_watcher(self):
+        self.check_watcher(InotifyWatcher([self.content], [self.template]))
+
+    def test_is_ignored(self):
+        for name in (".index.md.swp", ".#index.md", "#index.md#", "index.md~", "4913"):
+            self.assertTrue(is_ignored(os.path.join("content", name)), name)
+        for name in ("index.md", "#", "c#.md"):
+            self.assertFalse(is_ignored(os.path.join("content", name)), name)
+
+
+class TestDevServer(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.write("index.html", "<html><body><h1>Home</h1></body></html>")
+        self.write(os.path.join("blog", "index.html"), "<p>Blog</p>")
+        self.write("style.css", "body {}")
+        self.server = DevServer(self.tmp.name, "/site/", "127.0.0.1", 0)
+        self.server.start()
+
+    def tearDown(self):
+        self.server.stop()
+        self.tmp.cleanup()
+
+    def write(self, name, text):
+        path = os.path.join(self.tmp.name, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(text)
+
+    def connect(self, path):
+        conn = http.client.HTTPConnection(*self.server.httpd.server_address[:2], timeout=5)
+        self.addCleanup(conn.close)
+        conn.request("GET", path)
+        return conn.getresponse()
+
+    def get(self, path):
+        response = self.connect(path)
+        return response, response.read()
+
+    def test_script_injected(self):
+        script = LIVE_RELOAD_SCRIPT.encode()
+        response, body = self.get("/site/")
+        self.assertEqual(response.status, 200)
+        self.assertEqual(body, b"<html><body><h1>Home</h1>" + script + b"</body></html>")
+        self.assertEqual(response.getheader("Content-Length"), str(len(body)))
+        # without a closing body tag the script goes at the end
+        _, body = self.get("/site/blog/index.html")
+        self.assertEqual(body, b"<p>Blog</p>" + script)
+        _, body = self.get("/site/style.css")
+        self.assertEqual(body, b"body {}")
+
+    def test_basepath_stripped(self):
+        response, _ = self.get("/site/missing.html")
+        self.assertEqual(response.status, 404)
+        response, _ = self.get("/site/blog")
+        self.assertEqual(response.status, 301)
+        self.assertEqual(response.getheader("Location"), "/site/blog/")
+
+    def test_reload_stream(self):
+        response = self.connect(LIVE_RELOAD_PATH)
+        self.assertEqual(response.getheader("Content-Type"), "text/event-stream")
+        self.server.notify_reload()
+        self.assertEqual(response.readline(), b"data: reload\n")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,57 @@
+import unittest
+
+from frontmatter import split_front_matter, template_values
+
+
+class TestFrontMatter(unittest.TestCase):
+    def split(self, text):
+        front_matter, lines = split_front_matter(text.split("\n"))
+        return front_matter, list(lines)
+
+    def test_no_front_matter(self):
+        self.assertEqual(self.split("# Title\n\nbody"), ({}, ["# Title", "", "body"]))
+        self.assertEqual(split_front_matter([])[0], {})
+
+    def test_values(self):
+        front_matter, lines = self.split(
+            "---\n"
+            "title: 'Quoted: title'\n"
+            "# a comment\n"
+            "\n"
+            "date: 2024-05-01\n"
+            "tags: elves, dwarves\n"
+            "authors: [Bilbo, \"Frodo\"]\n"
+            "description: a: b\n"
+            "---\n"
+            "# Heading"
+        )
+        self.assertEqual(
+            front_matter,
+            {
+                "title": "Quoted: title",
+                "date": "2024-05-01",
+                "tags": ["elves", "dwarves"],
+                "authors": ["Bilbo", "Frodo"],
+                "description": "a: b",
+            },
+        )
+        self.assertEqual(lines, ["# Heading"])
+        self.assertEqual(template_values(front_matter)["authors"], "Bilbo, Frodo")
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            self.split("---\ntitle: x\n")
+        with self.assertRaises(ValueError):
+            self.split("---\nnot a pair\n---\n")
+        with self.assertRaises(ValueError):
+            self.split("---\ndate: 01/05/2024\n---\n")
+
+    def test_quoted_date(self):
+        front_matter, _ = self.split('---\ndate: "2024-05-01"\n---\n')
+        self.assertEqual(front_matter["date"], "2024-05-01")
+        with self.assertRaisesRegex(ValueError, "invalid front matter date: Jan 1"):
+            self.split('---\ndate: "Jan 1"\n---\n')
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,65 @@
+import os
+import tempfile
+import unittest
+
+import highlight
+from markdown_blocks import markdown_to_html_node
+
+
+class TestFenceLanguage(unittest.TestCase):
+    def test_fence_language(self):
+        self.assertEqual(highlight.fence_language("```"), None)
+        self.assertEqual(highlight.fence_language("```Python"), "python")
+        self.assertEqual(highlight.fence_language("``` c++ {linenos}"), "c++")
+        self.assertEqual(highlight.fence_language("```../x"), None)
+        self.assertEqual(highlight.fence_language("```."), None)
+        self.assertEqual(highlight.fence_language("```.."), None)
+        self.assertEqual(highlight.fence_language("```.net"), None)
+        self.assertEqual(highlight.fence_language("```objective-c"), "objective-c")
+
+
+class TestHighlight(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        highlight.configure()
+        self.tmp.cleanup()
+
+    def test_disabled_leaves_code_plain(self):
+        highlight.configure(False)
+        html = markdown_to_html_node("```python\nx = 1 < 2\n```").to_html()
+        self.assertEqual(html, "<div><pre><code>x = 1 &lt; 2\n</code></pre></div>")
+
+    @unittest.skipIf(highlight.pygments is None, "pygments is not installed")
+    def test_highlighted_block(self):
+        highlight.configure()
+        html = markdown_to_html_node("```python\ndef f():\n\n    pass\n```").to_html()
+        self.assertTrue(html.startswith('<div><pre><code class="language-python"><span'))
+        self.assertIn("\n\n", html)
+
+    @unittest.skipIf(highlight.pygments is None, "pygments is not installed")
+    def test_unknown_language_is_plain(self):
+        cache = highlight.configure(True, self.tmp.name)
+        html = markdown_to_html_node("```nosuchlang\na\n```").to_html()
+        self.assertEqual(html, "<div><pre><code>a\n</code></pre></div>")
+        self.assertEqual(highlight.highlight_code("a\n", "nosuchlang"), None)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+    @unittest.skipIf(highlight.pygments is None, "pygments is not installed")
+    def test_cache(self):
+        cache = highlight.configure(True, self.tmp.name)
+        first = highlight.highlight_code("print(1)\n", "python")
+        self.assertEqual((cache.hits, cache.misses), (0, 1))
+        path = cache.path("print(1)\n", "python")
+        self.assertTrue(os.path.exists(path))
+        self.assertIn(highlight.highlighter_version(), path)
+
+        # a fresh cache on the same directory, as on the next build
+        cache = highlight.configure(True, self.tmp.name)
+        self.assertEqual(highlight.highlight_code("print(1)\n", "python"), first)
+        self.assertEqual((cache.hits, cache.misses), (1, 0))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,5 +1,5 @@
 import unittest
-from htmlnode import LeafNode, ParentNode, HTMLNode
+from htmlnode import LeafNode, ParentNode, HTMLNode, RawNode
 
 
 class TestHTMLNode(unittest.TestCase):
@@ -64,6 +64,22 @@ class TestHTMLNode(unittest.TestCase):
         node = LeafNode(None, "Hello, world!")
         self.assertEqual(node.to_html(), "Hello, world!")
 
+    def test_leaf_escapes_text(self):
+        node = LeafNode("p", "a < b && c > d")
+        self.assertEqual(node.to_html(), "<p>a &lt; b &amp;&amp; c &gt; d</p>")
+        self.assertEqual(LeafNode(None, "<i>").to_html(), "&lt;i&gt;")
+
+    def test_props_escape_quotes(self):
+        node = LeafNode("img", "", {"src": "/a?x=1&y=2", "alt": 'say "hi" <now>'})
+        self.assertEqual(
+            node.to_html(),
+            '<img src="/a?x=1&amp;y=2" alt="say &quot;hi&quot; &lt;now&gt;"></img>',
+        )
+
+    def test_raw_node_is_not_escaped(self):
+        node = ParentNode("div", [RawNode("<b>&amp;</b>"), LeafNode(None, "&")])
+        self.assertEqual(node.to_html(), "<div><b>&amp;</b>&amp;</div>")
+
     def test_to_html_with_children(self):
         child_node = LeafNode("span", "child")
         parent_node = ParentNode("div", [child_node])
@@ -108,6 +124,58 @@ class TestHTMLNode(unittest.TestCase):
             "<h2><b>Bold text</b>Normal text<i>italic text</i>Normal text</h2>",
         )
 
+    def test_write_html(self):
+        node = ParentNode(
+            "p",
+            [LeafNode("b", "Bold text"), LeafNode(None, "Normal text")],
+            {"class": "intro"},
+        )
+        parts = []
+        node.write_html(parts.append)
+        self.assertEqual(
+            parts,
+            ['<p class="intro">', "<b>Bold text</b>", "Normal text", "</p>"],
+        )
+
+    def test_iter_html(self):
+        node = ParentNode("div", [ParentNode("span", [LeafNode("b", "x")])])
+        self.assertEqual(
+            list(node.iter_html()),
+            ["<div>", "<span>", "<b>x</b>", "</span>", "</div>"],
+        )
+
+    def test_iter_html_matches_to_html_wide(self):
+        items = [ParentNode("li", [LeafNode(None, f"item {i}")]) for i in range(2000)]
+        node = ParentNode("ul", items)
+        html = node.to_html()
+        self.assertEqual("".join(node.iter_html()), html)
+        self.assertTrue(html.startswith("<ul><li>item 0</li>"))
+        self.assertTrue(html.endswith("<li>item 1999</li></ul>"))
+
+    def test_parent_no_children(self):
+        node = ParentNode("div", None)
+        with self.assertRaises(ValueError):
+            node.to_html()
+        with self.assertRaises(ValueError):
+            list(node.iter_html())
+
+    def test_base_node_not_implemented(self):
+        node = HTMLNode("p", "x")
+        with self.assertRaisesRegex(NotImplementedError, "write_html"):
+            node.to_html()
+        with self.assertRaisesRegex(NotImplementedError, "iter_html"):
+            list(node.iter_html())
+
+    def test_no_instance_dict(self):
+        for node in (
+            HTMLNode("p", "x"),
+            LeafNode("b", "x"),
+            ParentNode("div", []),
+        ):
+            self.assertFalse(hasattr(node, "__dict__"))
+            with self.assertRaises(AttributeError):
+                node.extra = 1
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,113 @@
+import os
+import struct
+import tempfile
+import unittest
+
+import images
+from manifest import Manifest
+from textnode import TextNode, TextType, text_node_to_html_node
+
+
+def png_header(width, height):
+    return b"\x89PNG\r\n\x1a\n" + b"\x00\x00\x00\rIHDR" + struct.pack(">II", width, height)
+
+
+class TestImageSize(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, name, data):
+        path = os.path.join(self.tmp.name, name)
+        with open(path, "wb") as f:
+            f.write(data)
+        return path
+
+    def test_png(self):
+        path = self.write("a.png", png_header(640, 480) + b"\x08\x06\x00\x00\x00")
+        self.assertEqual(images.image_size(path), (640, 480))
+
+    def test_gif(self):
+        path = self.write("a.gif", b"GIF89a" + struct.pack("<HH", 20, 10) + b"\x00" * 16)
+        self.assertEqual(images.image_size(path), (20, 10))
+
+    def test_jpeg(self):
+        app0 = b"\xff\xe0" + struct.pack(">H", 16) + b"JFIF\x00" + b"\x00" * 9
+        sof = b"\xff\xc0" + struct.pack(">HBHH", 17, 8, 300, 400) + b"\x00" * 10
+        path = self.write("a.jpg", b"\xff\xd8" + app0 + sof)
+        self.assertEqual(images.image_size(path), (400, 300))
+
+    def test_unknown(self):
+        path = self.write("a.png", b"not an image at all, just text")
+        self.assertEqual(images.image_size(path), None)
+
+
+class TestOptimizeImages(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.src = os.path.join(self.tmp.name, "static")
+        self.dest = os.path.join(self.tmp.name, "docs")
+        self.cache_dir = os.path.join(self.tmp.name, "cache")
+        self.manifest = Manifest(os.path.join(self.tmp.name, "manifest.json"))
+        os.makedirs(os.path.join(self.src, "images"))
+        with open(os.path.join(self.src, "index.css"), "w") as f:
+            f.write("body {}")
+
+    def tearDown(self):
+        images.configure()
+        images.set_table({})
+        self.tmp.cleanup()
+
+    def test_sizes_without_variants(self):
+        images.configure(False, self.cache_dir)
+        with open(os.path.join(self.src, "images", "a.png"), "wb") as f:
+            f.write(png_header(1200, 600))
+        table = images.optimize_images(self.src, self.dest, self.manifest)
+        self.assertEqual(table, {"/images/a.png": {"width": 1200, "height": 600, "variants": []}})
+        node = text_node_to_html_node(TextNode("a", TextType.IMAGE, "/images/a.png"))
+        self.assertEqual(node.to_html(), '<img src="/images/a.png" alt="a" width="1200" height="600"></img>')
+        node = text_node_to_html_node(TextNode("b", TextType.IMAGE, "https://x.org/b.png"))
+        self.assertEqual(node.props, {"src": "https://x.org/b.png", "alt": "b"})
+
+    def test_table_version(self):
+        images.set_table({})
+        empty = images.table_version()
+        images.set_table({"/a.png": {"width": 1, "height": 1, "variants": []}})
+        self.assertNotEqual(images.table_version(), empty)
+
+    @unittest.skipIf(images.PIL is None, "pillow is not installed")
+    def test_variants(self):
+        from PIL import Image
+
+        cache = images.configure(True, self.cache_dir)
+        src_path = os.path.join(self.src, "images", "a.png")
+        Image.new("RGB", (1000, 500), "red").save(src_path)
+        table = images.optimize_images(self.src, self.dest, self.manifest)
+        variants = table["/images/a.png"]["variants"]
+        self.assertEqual([variant["width"] for variant in variants], [480, 960, 1000])
+        with Image.open(os.path.join(self.dest, "images", "a-480w.webp")) as variant:
+            self.assertEqual(variant.size, (480, 240))
+        self.assertEqual((cache.hits, cache.misses), (0, 3))
+        attributes = images.image_attributes("/images/a.png")
+        self.assertEqual(
+            attributes["srcset"],
+            "/images/a-480w.webp 480w, /images/a-960w.webp 960w, /images/a-1000w.webp 1000w",
+        )
+
+        # a wiped output directory is refilled from the cache
+        os.remove(os.path.join(self.dest, "images", "a-960w.webp"))
+        images.optimize_images(self.src, self.dest, self.manifest)
+        self.assertEqual((cache.hits, cache.misses), (1, 3))
+        self.assertTrue(os.path.exists(os.path.join(self.dest, "images", "a-960w.webp")))
+
+        # removing the source removes its variants
+        os.remove(src_path)
+        images.optimize_images(self.src, self.dest, self.manifest)
+        self.assertFalse(os.path.exists(os.path.join(self.dest, "images", "a-480w.webp")))
+        self.assertEqual(self.manifest.images, {})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,12 +1,18 @@
+import re
 import unittest
 
 from inline_markdown import (
+    INLINE_SYNTAXES,
+    InlineSyntax,
+    delimited_pattern,
     extract_markdown_images,
     extract_markdown_links,
     split_nodes_delimiter,
     split_nodes_image,
     split_nodes_link,
+    register_inline_syntax,
     text_to_textnodes,
+    unregister_inline_syntax,
 )
 from main import extract_title
 from textnode import TextNode, TextType
@@ -192,6 +198,91 @@ class TestInlineMarkdown(unittest.TestCase):
             nodes,
         )
 
+    def test_text_to_textnodes_plain(self):
+        self.assertListEqual(
+            [TextNode("just text", TextType.TEXT)],
+            text_to_textnodes("just text"),
+        )
+
+    def test_text_to_textnodes_unclosed(self):
+        with self.assertRaises(ValueError):
+            text_to_textnodes("This is **unclosed bold")
+
+    def test_text_to_textnodes_bracket_text(self):
+        self.assertListEqual(
+            [
+                TextNode("a [note] and ", TextType.TEXT),
+                TextNode("bold", TextType.BOLD),
+                TextNode(" ! [x]", TextType.TEXT),
+            ],
+            text_to_textnodes("a [note] and **bold** ! [x]"),
+        )
+
+    def test_text_to_textnodes_link_with_underscore(self):
+        self.assertListEqual(
+            [
+                TextNode("see ", TextType.TEXT),
+                TextNode("docs", TextType.LINK, "/my_page"),
+            ],
+            text_to_textnodes("see [docs](/my_page)"),
+        )
+
+    def test_text_to_textnodes_code_keeps_delimiters(self):
+        self.assertListEqual(
+            [
+                TextNode("use ", TextType.TEXT),
+                TextNode("snake_case", TextType.CODE),
+                TextNode(" and ", TextType.TEXT),
+                TextNode("x", TextType.ITALIC),
+            ],
+            text_to_textnodes("use `snake_case` and _x_"),
+        )
+
+    def test_inline_syntaxes_compiled(self):
+        names = [syntax.name for syntax in INLINE_SYNTAXES]
+        self.assertEqual(names, ["bold", "italic", "code", "image", "link"])
+        for syntax in INLINE_SYNTAXES:
+            self.assertTrue(hasattr(syntax.pattern, "match"))
+
+    def test_register_inline_syntax(self):
+        register_inline_syntax(
+            InlineSyntax(
+                "kbd",
+                "<<",
+                r"<<([^>]*)>>",
+                lambda match: TextNode(match.group(1), TextType.CODE),
+            )
+        )
+        try:
+            self.assertListEqual(
+                [
+                    TextNode("press ", TextType.TEXT),
+                    TextNode("Ctrl", TextType.CODE),
+                    TextNode(" then ", TextType.TEXT),
+                    TextNode("q", TextType.BOLD),
+                    TextNode(" <<", TextType.TEXT),
+                ],
+                text_to_textnodes("press <<Ctrl>> then **q** <<"),
+            )
+            with self.assertRaises(ValueError):
+                register_inline_syntax(
+                    InlineSyntax("kbd", "<<", r"<<(.*)", lambda match: None)
+                )
+        finally:
+            unregister_inline_syntax("kbd")
+        self.assertListEqual(
+            [TextNode("<<Ctrl>>", TextType.TEXT)],
+            text_to_textnodes("<<Ctrl>>"),
+        )
+
+    def test_delimited_pattern(self):
+        pattern = re.compile(delimited_pattern("**"))
+        self.assertEqual(pattern.match("**a*b** c**").group(1), "a*b")
+        self.assertEqual(pattern.match("**a***").group(1), "a")
+        self.assertIsNone(pattern.match("**a*"))
+        pattern = re.compile(delimited_pattern("_"))
+        self.assertEqual(pattern.match("_a\nb_").group(1), "a\nb")
+
     def test_extract_title_h1(self):
         title = extract_title("# Header")
         self.assertEqual("Header", title)
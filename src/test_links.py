@@ -0,0 +1,86 @@
+import os
+import tempfile
+import unittest
+
+from links import (
+    RouteIndex,
+    broken_links,
+    broken_template_links,
+    internal_path,
+    link_report,
+)
+
+
+class TestInternalPath(unittest.TestCase):
+    def test_internal_path(self):
+        self.assertEqual(internal_path("/blog/tom", "/"), "/blog/tom")
+        self.assertEqual(internal_path("../tom/", "/blog/majesty/"), "/blog/tom/")
+        self.assertEqual(internal_path("/a%20b.png?x=1#top", "/"), "/a b.png")
+        self.assertEqual(internal_path("https://example.com/", "/"), None)
+        self.assertEqual(internal_path("//cdn.example.com/a.js", "/"), None)
+        self.assertEqual(internal_path("mailto:me@example.com", "/"), None)
+        self.assertEqual(internal_path("#section", "/"), None)
+        self.assertEqual(internal_path("", "/"), None)
+        self.assertEqual(internal_path("/", "/blog/"), "/")
+        self.assertEqual(internal_path("/blog/./tom/../majesty/", "/"), "/blog/majesty/")
+        self.assertEqual(internal_path("/blog//tom", "/"), "/blog//tom")
+
+
+class TestRouteIndex(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dest = os.path.join(self.tmp.name, "docs")
+        self.routes = RouteIndex(self.dest)
+        self.routes.update(
+            [
+                os.path.join(self.dest, "index.html"),
+                os.path.join(self.dest, "blog", "tom", "index.html"),
+                os.path.join(self.dest, "images", "tom.png"),
+            ]
+        )
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_routes(self):
+        for url in ["/", "/index.html", "/blog/tom", "/blog/tom/", "/images/tom.png"]:
+            self.assertIn(url, self.routes)
+        self.assertNotIn("/blog/", self.routes)
+        self.assertNotIn("", self.routes)
+
+    def test_broken_links(self):
+        src_path = os.path.join(self.tmp.name, "index.md")
+        with open(src_path, "w") as f:
+            f.write(
+                "# Home\n\n[tom](/blog/tom) [gone](/blog/gone)\n\n![x](images/none.png)\n"
+                "\n[again](/blog/gone)\n"
+            )
+        meta = {
+            src_path: {
+                "dest": os.path.join(self.dest, "index.html"),
+                "links": ["/blog/tom", "/blog/gone", "/blog/gone", "https://example.com"],
+                "images": ["images/none.png", "/images/tom.png"],
+            }
+        }
+        broken = broken_links(meta, self.routes)
+        self.assertEqual(
+            broken, [(src_path, "link", "/blog/gone"), (src_path, "image", "images/none.png")]
+        )
+        self.assertEqual(
+            link_report(broken),
+            [
+                f"  {src_path}:3: broken link /blog/gone",
+                f"  {src_path}:7: broken link /blog/gone",
+                f"  {src_path}:5: broken image images/none.png",
+            ],
+        )
+
+    def test_broken_template_links(self):
+        path = os.path.join(self.tmp.name, "template.html")
+        with open(path, "w") as f:
+            f.write('<a href="/">home</a>\n<link href="/index.css" />\n<a href="{{ Url }}">x</a>\n')
+        self.assertEqual(broken_template_links(path, self.routes), [(path, 2, "/index.css")])
+
+
+if __name__ == "__main__":
+    unittest.main()
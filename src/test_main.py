@@ -0,0 +1,296 @@
+import io
+import os
+import re
+import tempfile
+from contextlib import redirect_stdout
+import unittest
+
+import highlight
+import main
+import profiler
+from links import RouteIndex
+from manifest import Manifest
+from markdown_blocks import BlockCache
+from site_index import build_site_index
+from template import Template
+
+TEMPLATE = (
+    '<title>{{ Title }}</title><meta name="description" content="{{ description }}">'
+    "{{ Content }}"
+)
+
+
+class TestFrontMatterSlots(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.template = Template(TEMPLATE)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def render(self, name, text):
+        src_path = os.path.join(self.tmp.name, name)
+        dest_path = os.path.join(self.tmp.name, "docs", name.replace(".md", ".html"))
+        return main.render_page_text(src_path, text, 0, self.template, dest_path)
+
+    def test_page_with_key(self):
+        html, _ = self.render("a.md", '---\ndescription: "Tom" & co\n---\n# A\n\nText')
+        self.assertIn('content="&quot;Tom&quot; &amp; co"', html)
+
+    def test_page_without_key(self):
+        html, _ = self.render("b.md", "# B\n\nText")
+        self.assertIn('content=""', html)
+        self.assertNotIn("{{", html)
+
+    def test_invalid_date_names_page(self):
+        src_path = os.path.join(self.tmp.name, "d.md")
+        with open(src_path, "w") as f:
+            f.write('---\ndate: "Jan 1"\n---\n# D\n')
+        dest_path = os.path.join(self.tmp.name, "docs", "d.html")
+        with (
+            redirect_stdout(io.StringIO()),
+            self.assertRaisesRegex(main.PageBuildError, f"{src_path}: invalid front matter date"),
+        ):
+            main.generate_pages([(src_path, dest_path)], self.template)
+        self.assertFalse(os.path.exists(dest_path))
+
+    def test_listing_without_key(self):
+        _, meta = self.render("c.md", "---\ntags: elves\n---\n# C\n\nText")
+        outputs = build_site_index(
+            {"content/c.md": meta}, self.template, os.path.join(self.tmp.name, "docs")
+        )
+        listing = outputs[os.path.join(self.tmp.name, "docs", "tags", "elves", "index.html")]
+        self.assertIn('content=""', listing)
+        self.assertNotIn("{{", listing)
+
+
+PAGE = """# {title}
+
+Shared paragraph with a [link](/index.html).
+
+```python
+print("shared")
+```
+
+Text only {title} has.
+"""
+
+
+class SiteTestCase(unittest.TestCase):
+    # a content directory holding one PAGE per name, and a template
+    pages = ()
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.content = os.path.join(self.tmp.name, "content")
+        self.template_path = os.path.join(self.tmp.name, "template.html")
+        self.write_template(TEMPLATE)
+        self.sources = [self.write(name, PAGE.format(title=name)) for name in self.pages]
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, name, text):
+        path = os.path.join(self.content, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(text)
+        return path
+
+    def write_template(self, text):
+        with open(self.template_path, "w") as f:
+            f.write(text)
+
+
+class TestJobs(SiteTestCase):
+    pages = ("index.md", "blog/a.md", "blog/b.md", "blog/c.md", "d.md")
+
+    def tearDown(self):
+        highlight.configure()
+        super().tearDown()
+
+    def build(self, name, jobs, block_cache=None):
+        dest = os.path.join(self.tmp.name, name)
+        out = io.StringIO()
+        with redirect_stdout(out):
+            main.generate_pages_recursive(
+                "/", self.content, self.template_path, dest, jobs, block_cache
+            )
+        logged = [line for line in out.getvalue().splitlines() if line.startswith("Generating")]
+        return dest, logged
+
+    def read_tree(self, dest):
+        files = {}
+        for dirpath, _, filenames in os.walk(dest):
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                with open(path, "rb") as f:
+                    files[os.path.relpath(path, dest)] = f.read()
+        return files
+
+    def test_same_output_as_sequential(self):
+        sequential, _ = self.build("seq", 1)
+        parallel, _ = self.build("par", 2)
+        self.assertEqual(len(self.read_tree(sequential)), 5)
+        self.assertEqual(self.read_tree(parallel), self.read_tree(sequential))
+
+    def test_log_in_walk_order(self):
+        dest, logged = self.build("par", 2)
+        template = Template.load(self.template_path, "/")
+        self.assertEqual(
+            logged,
+            [
+                main.page_log_line(src_path, template, dest_path)
+                for src_path, dest_path in main.collect_pages(self.content, dest)
+            ],
+        )
+
+    def test_worker_failure_names_page(self):
+        src_path = self.write("blog/b.md", '---\ndate: "Jan 1"\n---\n# B\n')
+        with self.assertRaisesRegex(main.PageBuildError, re.escape(src_path)):
+            self.build("par", 2)
+
+    def test_block_cache_and_profile_merged(self):
+        totals = []
+        for jobs in (1, 2):
+            block_cache = BlockCache(16)
+            profiler.start()
+            try:
+                self.build(f"out{jobs}", jobs, block_cache)
+            finally:
+                prof = profiler.stop()
+            totals.append((block_cache.hits + block_cache.misses, len(prof.pages)))
+        self.assertEqual(totals[1], totals[0])
+        self.assertGreater(totals[0][0], 0)
+        self.assertEqual(totals[0][1], 5)
+
+    @unittest.skipIf(highlight.pygments is None, "pygments is not installed")
+    def test_highlight_cache_merged(self):
+        # without a block cache every page looks its code block up
+        totals = []
+        for jobs in (1, 2):
+            cache = highlight.configure(True, os.path.join(self.tmp.name, f"cache{jobs}"))
+            self.build(f"out{jobs}", jobs)
+            totals.append(cache.hits + cache.misses)
+        self.assertEqual(totals, [5, 5])
+
+
+class TestIncremental(SiteTestCase):
+    # in walk order, which is sorted
+    pages = ("b.md", "blog/a.md", "index.md")
+
+    def setUp(self):
+        super().setUp()
+        self.dest = os.path.join(self.tmp.name, "docs")
+        self.manifest = Manifest(os.path.join(self.tmp.name, "manifest.json"))
+
+    def build(self, basepath="/"):
+        # returns the source paths that were rendered
+        out = io.StringIO()
+        with redirect_stdout(out):
+            main.generate_pages_incremental(
+                basepath, self.content, self.template_path, self.dest, self.manifest
+            )
+        return re.findall(r"^Generating page from (\S+) to", out.getvalue(), re.M)
+
+    def test_unchanged_pages_skipped(self):
+        self.assertEqual(self.build(), self.sources)
+        self.assertEqual(self.build(), [])
+        self.write("b.md", "# Changed\n")
+        self.assertEqual(self.build(), [self.sources[0]])
+
+    def test_template_change_renders_all(self):
+        self.build()
+        self.write_template("<main>" + TEMPLATE + "</main>")
+        self.assertEqual(self.build(), self.sources)
+        with open(os.path.join(self.dest, "b.html")) as f:
+            self.assertTrue(f.read().startswith("<main>"))
+
+    def test_basepath_change_renders_all(self):
+        self.build()
+        self.assertEqual(self.build("/site/"), self.sources)
+        with open(os.path.join(self.dest, "b.html")) as f:
+            self.assertIn('href="/site/index.html"', f.read())
+
+    def test_deleted_source_removes_output(self):
+        self.build()
+        output = os.path.join(self.dest, "blog", "a.html")
+        self.assertTrue(os.path.exists(output))
+        os.remove(self.sources[1])
+        self.assertEqual(self.build(), [])
+        self.assertFalse(os.path.exists(output))
+        self.assertNotIn(self.sources[1], self.manifest.meta)
+
+    def test_full_build_removes_deleted_pages(self):
+        self.build()
+        output = os.path.join(self.dest, "blog", "a.html")
+        os.remove(self.sources[1])
+        with redirect_stdout(io.StringIO()):
+            main.generate_pages_full(
+                "/", self.content, self.template_path, self.dest, self.manifest
+            )
+        self.assertFalse(os.path.exists(output))
+        self.assertEqual(sorted(self.manifest.pages), [self.sources[0], self.sources[2]])
+        self.assertEqual(self.build(), [])
+
+    def test_update_routes(self):
+        self.build()
+        routes = RouteIndex(self.dest)
+        routes.update(page["dest"] for page in self.manifest.meta.values())
+        listing = os.path.join(self.dest, "tags", "x", "index.html")
+        routes.add(listing)
+        edited = {self.sources[0]: self.manifest.meta[self.sources[0]]}
+        self.assertFalse(main.update_routes(routes, self.manifest, edited, []))
+
+        # a removed page and a listing that is no longer generated go away
+        touched = {self.sources[1]: self.manifest.meta.pop(self.sources[1])}
+        self.assertTrue(main.update_routes(routes, self.manifest, touched, [listing]))
+        self.assertNotIn("/blog/a.html", routes)
+        self.assertNotIn("/tags/x/", routes)
+        self.assertIn("/b.html", routes)
+
+    def test_missing_output_renders_again(self):
+        self.build()
+        os.remove(os.path.join(self.dest, "b.html"))
+        self.assertEqual(self.build(), [self.sources[0]])
+        self.assertTrue(os.path.exists(os.path.join(self.dest, "b.html")))
+
+
+class TestRebuildChanged(SiteTestCase):
+    pages = ("a.md", "b.md")
+
+    def setUp(self):
+        super().setUp()
+        # watch mode works on the site layout relative to the working directory
+        self.addCleanup(os.chdir, os.getcwd())
+        os.chdir(self.tmp.name)
+        self.manifest = Manifest("manifest.json")
+        with redirect_stdout(io.StringIO()):
+            main.generate_pages_incremental(
+                "/", main.CONTENT_DIR, main.TEMPLATE_PATH, main.OUTPUT_DIR, self.manifest
+            )
+        self.template = Template.load(main.TEMPLATE_PATH)
+
+    def rebuild(self, *names):
+        changed = {os.path.join(main.CONTENT_DIR, name) for name in names}
+        with redirect_stdout(io.StringIO()):
+            return main.rebuild_changed(
+                changed, self.template, main.hash_file(main.TEMPLATE_PATH), self.manifest
+            )
+
+    def test_bad_file_does_not_stop_batch(self):
+        old_page = self.manifest.meta[os.path.join("content", "a.md")]
+        self.write("a.md", "# Edited\n")
+        self.write("b.md", "---\nnot front matter\n---\n# B\n")
+        touched, failures = self.rebuild("a.md", "b.md")
+        self.assertEqual(touched, {os.path.join("content", "a.md"): old_page})
+        self.assertEqual([path for path, _ in failures], [os.path.join("content", "b.md")])
+        with open(os.path.join("docs", "a.html")) as f:
+            self.assertIn("Edited", f.read())
+        # the bad page keeps its last good output
+        with open(os.path.join("docs", "b.html")) as f:
+            self.assertIn("<title>b.md</title>", f.read())
+
+
+if __name__ == "__main__":
+    unittest.main()
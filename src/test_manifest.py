@@ -0,0 +1,81 @@
+import os
+import tempfile
+import unittest
+
+from manifest import Manifest, hash_file, stale_outputs
+
+
+class TestManifest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "cache", "manifest.json")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_load_missing(self):
+        manifest = Manifest.load(self.path)
+        self.assertEqual(manifest.pages, {})
+        self.assertEqual(manifest.assets, {})
+
+    def test_load_corrupt(self):
+        os.makedirs(os.path.dirname(self.path))
+        with open(self.path, "w") as f:
+            f.write("{not json")
+        manifest = Manifest.load(self.path)
+        self.assertEqual(manifest.pages, {})
+
+    def test_save_and_load(self):
+        manifest = Manifest(self.path)
+        manifest.pages["content/index.md"] = {
+            "hash": "abc",
+            "template": "def",
+            "basepath": "/",
+            "dest": "docs/index.html",
+        }
+        manifest.meta["content/index.md"] = {"title": "Home", "mtime": 1, "dest": "docs/index.html"}
+        manifest.generated = ["docs/sitemap.xml"]
+        manifest.images["static/a.png"] = {"width": 2, "height": 1, "variants": []}
+        manifest.compressed["docs/index.html"] = {"hash": "abc", "outputs": ["docs/index.html.gz"]}
+        manifest.save()
+        loaded = Manifest.load(self.path)
+        self.assertEqual(loaded.pages, manifest.pages)
+        self.assertEqual(loaded.assets, {})
+        self.assertEqual(loaded.meta, manifest.meta)
+        self.assertEqual(loaded.generated, ["docs/sitemap.xml"])
+        self.assertEqual(loaded.images, manifest.images)
+        self.assertEqual(loaded.compressed, manifest.compressed)
+
+    def test_is_fresh(self):
+        dest = os.path.join(self.tmp.name, "index.html")
+        entry = {"hash": "abc", "dest": dest}
+        manifest = Manifest(self.path, pages={"index.md": dict(entry)})
+        # the output has not been written yet
+        self.assertFalse(manifest.is_fresh("pages", "index.md", entry))
+        with open(dest, "w") as f:
+            f.write("<p>hi</p>")
+        self.assertTrue(manifest.is_fresh("pages", "index.md", entry))
+        self.assertFalse(
+            manifest.is_fresh("pages", "index.md", {"hash": "xyz", "dest": dest})
+        )
+
+    def test_hash_file(self):
+        path = os.path.join(self.tmp.name, "a.md")
+        with open(path, "w") as f:
+            f.write("# Hello")
+        first = hash_file(path)
+        with open(path, "w") as f:
+            f.write("# Hello!")
+        self.assertNotEqual(first, hash_file(path))
+
+    def test_stale_outputs(self):
+        old = {
+            "a.md": {"dest": "docs/a.html"},
+            "b.md": {"dest": "docs/b.html"},
+        }
+        new = {"a.md": {"dest": "docs/a.html"}}
+        self.assertEqual(stale_outputs(old, new), ["docs/b.html"])
+
+
+if __name__ == "__main__":
+    unittest.main()
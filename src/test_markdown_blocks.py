@@ -1,10 +1,17 @@
 import unittest
+from io import StringIO
 
 from markdown_blocks import (
+    BlockCache,
     BlockType,
     block_to_block_type,
+    iter_lines,
     markdown_to_blocks,
+    markdown_to_document,
     markdown_to_html_node,
+    read_blocks,
+    write_blocks_html,
+    write_markdown_html,
 )
 
 
@@ -164,6 +171,156 @@ the **same** even with inline stuff
             "<div><pre><code>This is text that _should_ remain\nthe **same** even with inline stuff\n</code></pre></div>",
         )
 
+    def test_write_markdown_html(self):
+        md = """
+# this is an h1
+
+- a list
+- with **bold**
+
+```
+code
+```
+"""
+
+        parts = []
+        write_markdown_html(md, parts.append)
+        self.assertEqual("".join(parts), markdown_to_html_node(md).to_html())
+        self.assertEqual(parts[0], "<div>")
+        self.assertEqual(parts[-1], "</div>")
+
+    def test_block_cache(self):
+        md = """
+Shared **footer** text
+
+- a
+- b
+
+Shared **footer** text
+"""
+
+        cache = BlockCache(8)
+        parts = []
+        write_markdown_html(md, parts.append, cache)
+        self.assertEqual("".join(parts), markdown_to_html_node(md).to_html())
+        self.assertEqual(cache.hits, 1)
+        self.assertEqual(cache.misses, 2)
+
+    def test_markdown_to_document(self):
+        md = """
+Intro with a [link](/a) and ![pic](/p.png)
+
+# The **Title**
+
+## Part one
+
+- [another](/b)
+- `code` words
+
+```
+not counted
+```
+"""
+        doc = markdown_to_document(md)
+        self.assertEqual(doc.node.to_html(), markdown_to_html_node(md).to_html())
+        self.assertEqual(doc.title, "The **Title**")
+        self.assertEqual(doc.headings, [(1, "The Title"), (2, "Part one")])
+        self.assertEqual(doc.links, ["/a", "/b"])
+        self.assertEqual(doc.images, ["/p.png"])
+        self.assertEqual(doc.words, 12)
+
+    def test_block_cache_keeps_metadata(self):
+        md = "# Title\n\nSee [here](/x)\n\nSee [here](/x)"
+        cache = BlockCache(8)
+        doc = markdown_to_document(md, cache)
+        self.assertEqual(cache.hits, 1)
+        self.assertEqual(doc.links, ["/x", "/x"])
+        self.assertEqual(doc.headings, [(1, "Title")])
+        self.assertEqual(doc.words, 5)
+
+    def test_block_cache_evicts_least_recent(self):
+        cache = BlockCache(2)
+        for block in ["one", "two", "one", "three", "two"]:
+            cache.block_to_html_node(block)
+        # "two" was evicted by "three" because "one" had been used since
+        self.assertEqual(cache.hits, 1)
+        self.assertEqual(cache.misses, 4)
+        self.assertEqual(
+            [text for _, text in cache.entries],
+            ["three", "two"],
+        )
+
+    def test_markdown_to_blocks_matches_text_split(self):
+        for md in [
+            "",
+            "\n\n\n",
+            "a\n\n\n",
+            "a\n\n\n\n\nb",
+            "a\n\n  \n\nb",
+            "  a\n  \n\tb  \n",
+            "\n\n\n\n x\n\n",
+        ]:
+            expected = [block.strip() for block in md.split("\n\n") if block != ""]
+            self.assertEqual(markdown_to_blocks(md), expected, repr(md))
+
+    def test_fenced_code_keeps_blank_lines(self):
+        md = """
+Before
+
+```
+first
+
+second
+
+
+third
+```
+After
+"""
+        self.assertEqual(
+            markdown_to_blocks(md),
+            ["Before", "```\nfirst\n\nsecond\n\n\nthird\n```", "After"],
+        )
+        self.assertEqual(
+            markdown_to_html_node(md).to_html(),
+            "<div><p>Before</p><pre><code>first\n\nsecond\n\n\nthird\n</code></pre><p>After</p></div>",
+        )
+
+    def test_unclosed_fence_runs_to_end(self):
+        md = "Before\n\n```\ncode\n\n# not a heading"
+        self.assertEqual(markdown_to_blocks(md), ["Before", "```\ncode\n\n# not a heading\n```"])
+        self.assertEqual(
+            markdown_to_html_node(md).to_html(),
+            "<div><p>Before</p><pre><code>code\n\n# not a heading\n</code></pre></div>",
+        )
+
+    def test_indented_fence_closes(self):
+        md = "  ```\n  code\n\n  more\n  ```\n\nAfter"
+        self.assertEqual(markdown_to_blocks(md), ["```\n  code\n\n  more\n  ```", "After"])
+        self.assertEqual(
+            markdown_to_html_node(md).to_html(),
+            "<div><pre><code>  code\n\n  more\n</code></pre><p>After</p></div>",
+        )
+
+    def test_iter_lines(self):
+        for text in ["", "a", "a\n", "a\n\nb", "a\n\n\n"]:
+            self.assertEqual(list(iter_lines(StringIO(text))), text.split("\n"))
+
+    def test_read_blocks(self):
+        md = "# Title\n\n- a\n- b\n\n```\ncode\n```\n"
+        blocks = list(read_blocks(iter_lines(StringIO(md))))
+        self.assertEqual(
+            blocks,
+            [
+                (BlockType.HEADING, ["# Title"]),
+                (BlockType.ULIST, ["- a", "- b"]),
+                (BlockType.CODE, ["```", "code", "```"]),
+            ],
+        )
+        parts = []
+        write_blocks_html(iter(blocks), parts.append)
+        self.assertEqual("".join(parts), markdown_to_html_node(md).to_html())
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,75 @@
+import threading
+import time
+import unittest
+
+from pipeline import PipelineStats, run_pipeline
+
+
+class TestRunPipeline(unittest.TestCase):
+    def test_renders_in_order(self):
+        written = {}
+        rendered = []
+
+        def read(item):
+            # later items finish reading first
+            time.sleep((10 - item) * 0.001)
+            return item * 2
+
+        def render(item, data):
+            rendered.append(item)
+            return f"<p>{data}</p>"
+
+        def write(item, output):
+            written[item] = output
+
+        run_pipeline(range(10), read, render, write, io_threads=4, depth=3)
+        self.assertEqual(rendered, list(range(10)))
+        self.assertEqual(written, {i: f"<p>{i * 2}</p>" for i in range(10)})
+
+    def test_bounded_prefetch(self):
+        lock = threading.Lock()
+        reads = []
+        ahead = []
+
+        def read(item):
+            with lock:
+                reads.append(item)
+            return item
+
+        def render(item, data):
+            with lock:
+                ahead.append(len(reads) - item)
+            return data
+
+        run_pipeline(range(20), read, render, lambda item, output: None, io_threads=2, depth=3)
+        self.assertLessEqual(max(ahead), 3)
+
+    def test_read_error(self):
+        def read(item):
+            if item == 3:
+                raise ValueError("bad page")
+            return item
+
+        rendered = []
+        with self.assertRaises(ValueError):
+            run_pipeline(
+                range(10), read, lambda item, data: rendered.append(item), lambda i, o: None
+            )
+        self.assertEqual(rendered, [0, 1, 2])
+
+    def test_write_error(self):
+        def write(item, output):
+            raise OSError("disk full")
+
+        with self.assertRaises(OSError):
+            run_pipeline(range(5), lambda item: item, lambda item, data: data, write)
+
+    def test_stats(self):
+        stats = PipelineStats()
+        result = run_pipeline([1, 2], lambda i: i, lambda i, d: d, lambda i, o: None, stats=stats)
+        self.assertIs(result, stats)
+        self.assertTrue(stats.stats_line().startswith("Pipeline: read "))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,51 @@
+import time
+import unittest
+
+import markdown_blocks
+import profiler
+
+
+class TestProfiler(unittest.TestCase):
+    def tearDown(self):
+        if profiler.active() is not None:
+            profiler.stop()
+
+    def test_inactive_is_noop(self):
+        fn = len
+        self.assertIs(profiler.timed(fn, "write"), fn)
+        with profiler.phase("read"):
+            pass
+
+    def test_nested_phases_are_exclusive(self):
+        prof = profiler.Profiler()
+        with prof.phase("template"):
+            time.sleep(0.01)
+            with prof.phase("write"):
+                time.sleep(0.02)
+        self.assertGreaterEqual(prof.totals["write"], 0.02)
+        self.assertGreaterEqual(prof.totals["template"], 0.01)
+        self.assertLess(prof.totals["template"], 0.02)
+
+    def test_page_records(self):
+        prof = profiler.start()
+        with profiler.page("content/index.md"):
+            markdown_blocks.markdown_to_html_node("# Title\n\nSome **bold** text")
+        prof = profiler.stop()
+        self.assertEqual(len(prof.pages), 1)
+        record = prof.pages[0]
+        self.assertEqual(record["page"], "content/index.md")
+        for name in ("split", "type", "inline", "tree"):
+            self.assertIn(name, record["phases"])
+        self.assertEqual(prof.to_json()["pages"], [record])
+        self.assertIn("content/index.md", prof.report())
+
+    def test_stop_restores_parser(self):
+        original = markdown_blocks.text_to_textnodes
+        profiler.start()
+        self.assertIsNot(markdown_blocks.text_to_textnodes, original)
+        profiler.stop()
+        self.assertIs(markdown_blocks.text_to_textnodes, original)
+
+
+if __name__ == "__main__":
+    unittest.main()
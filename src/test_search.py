@@ -0,0 +1,161 @@
+import json
+import os
+import tempfile
+import unittest
+
+from markdown_blocks import BlockCache, markdown_to_document
+from search import build_search_index, index_paths, shard_key, tokenize
+
+
+class TestTokenize(unittest.TestCase):
+    def test_tokenize(self):
+        self.assertEqual(
+            tokenize("The Lord of the Rings, a 1954 book"),
+            ["the", "lord", "of", "the", "rings", "1954", "book"],
+        )
+
+    def test_shard_key(self):
+        self.assertEqual(shard_key("lord"), "lo")
+        self.assertEqual(shard_key("1954"), "19")
+        # non-ascii prefixes share one shard, so file names stay plain
+        self.assertEqual(shard_key("eärendil"), "_")
+
+    def test_document_terms(self):
+        markdown = "# Tom\n\n**Tom** sings to [Goldberry](/gold)\n\n![tom](/tom.png)"
+        doc = markdown_to_document(markdown)
+        self.assertEqual(doc.to_json()["terms"], {"tom": 2, "sings": 1, "to": 1, "goldberry": 1})
+        # text is counted block by block, not held until the page is done
+        self.assertEqual(doc.text, [])
+
+    def test_cached_blocks_keep_terms(self):
+        cache = BlockCache()
+        markdown_to_document("Shared footer text", cache)
+        doc = markdown_to_document("# Page\n\nShared footer text", cache)
+        self.assertEqual(doc.to_json()["terms"], {"page": 1, "shared": 1, "footer": 1, "text": 1})
+
+
+class TestSearchIndex(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dest = self.tmp.name
+        self.terms = {
+            "content/a.md": {"lord": 2, "rings": 1},
+            "content/b.md": {"lord": 1, "tom": 3},
+        }
+        self.meta = {
+            "content/a.md": self.page("a", "A", self.terms["content/a.md"]),
+            "content/b.md": self.page("b", "B", self.terms["content/b.md"]),
+        }
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def page(self, name, title, terms):
+        return {"dest": os.path.join(self.dest, name, "index.html"), "title": title, "terms": terms}
+
+    def build(self, state, basepath="/", changed=None, cache=None):
+        outputs, removed, state = build_search_index(
+            self.meta, state, self.dest, basepath, self.terms.get, changed, cache
+        )
+        for path, contents in outputs.items():
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "w") as f:
+                f.write(contents)
+        for path in removed:
+            os.remove(path)
+        # like the manifest, only pages rendered by the next build have terms
+        for page in self.meta.values():
+            page.pop("terms", None)
+        return {os.path.relpath(path, self.dest) for path in outputs}, state
+
+    def change(self, name, title, terms):
+        self.terms[f"content/{name}.md"] = terms
+        self.meta[f"content/{name}.md"] = self.page(name, title, terms)
+
+    def read(self, name):
+        with open(os.path.join(self.dest, "search", name)) as f:
+            return json.load(f)
+
+    def test_full_build(self):
+        written, state = self.build({}, "/site/")
+        self.assertEqual(
+            written, {"search/index.json", "search/lo.json", "search/ri.json", "search/to.json"}
+        )
+        self.assertEqual(self.read("lo.json"), {"lord": [[0, 2], [1, 1]]})
+        index = self.read("index.json")
+        self.assertEqual(index["shards"], ["lo", "ri", "to"])
+        self.assertEqual(index["pages"], {"0": ["/site/a/", "A"], "1": ["/site/b/", "B"]})
+
+    def test_incremental(self):
+        _, state = self.build({})
+        written, state = self.build(state)
+        self.assertEqual(written, set())
+
+        # only the shards whose postings moved are rewritten, and the index
+        # only when the shards or the pages in it change
+        self.change("b", "B", {"lord": 1, "tom": 3, "bombadil": 1})
+        written, state = self.build(state)
+        self.assertEqual(written, {"search/index.json", "search/bo.json"})
+
+        # a changed shard keeps the postings of pages that were not rendered
+        self.change("a", "A", {"lord": 5, "rings": 1})
+        written, state = self.build(state)
+        self.assertEqual(written, {"search/lo.json"})
+        self.assertEqual(self.read("lo.json"), {"lord": [[0, 5], [1, 1]]})
+
+        # new pages get fresh ids, removed pages free their shards
+        del self.meta["content/a.md"]
+        self.change("c", "C", {"tom": 1})
+        written, state = self.build(state)
+        self.assertEqual(written, {"search/index.json", "search/lo.json", "search/to.json"})
+        self.assertEqual(self.read("lo.json"), {"lord": [[1, 1]]})
+        self.assertEqual(self.read("to.json"), {"tom": [[1, 3], [2, 1]]})
+        self.assertFalse(os.path.exists(os.path.join(self.dest, "search", "ri.json")))
+
+    def test_missing_shards_are_rewritten(self):
+        _, state = self.build({})
+        os.remove(os.path.join(self.dest, "search", "to.json"))
+        self.terms["content/a.md"] = None
+        written, state = self.build(state)
+        # only the pages in the missing shard are asked for their terms
+        self.assertEqual(written, {"search/to.json"})
+        self.assertEqual(self.read("to.json"), {"tom": [[1, 3]]})
+
+    def test_changed_pages_only(self):
+        _, state = self.build({})
+        self.change("a", "A", {"lord": 2, "rings": 2})
+        self.change("b", "B", {"lord": 1, "tom": 4})
+        written, state = self.build(state, changed={"content/b.md"})
+        self.assertEqual(written, {"search/to.json"})
+        self.assertEqual(self.read("ri.json"), {"rings": [[0, 1]]})
+
+        del self.meta["content/b.md"]
+        written, state = self.build(state, changed={"content/b.md"})
+        self.assertEqual(written, {"search/index.json", "search/lo.json"})
+        self.assertEqual(self.read("index.json")["pages"], {"0": ["/a/", "A"]})
+        self.assertEqual(state["shards"], {"lo": 1, "ri": 1})
+
+    def test_cache(self):
+        cache = {}
+        _, state = self.build({}, cache=cache)
+        self.assertEqual(cache["lo"], {"lord": [[0, 2], [1, 1]]})
+        # a cached shard is updated without reading its file
+        with open(os.path.join(self.dest, "search", "lo.json"), "w") as f:
+            f.write("{}")
+        self.change("b", "B", {"lord": 4, "tom": 3})
+        written, state = self.build(state, cache=cache)
+        self.assertEqual(written, {"search/lo.json"})
+        self.assertEqual(self.read("lo.json"), {"lord": [[0, 2], [1, 4]]})
+
+        del self.meta["content/a.md"]
+        _, state = self.build(state, cache=cache)
+        self.assertEqual(sorted(cache), ["lo", "to"])
+
+    def test_index_paths(self):
+        _, state = self.build({})
+        self.assertEqual(len(index_paths(state, self.dest)), 4)
+        self.assertEqual(index_paths({}, self.dest), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,113 @@
+import os
+import unittest
+
+from site_index import build_site_index, listing_urls, page_url, tag_slug, url_dest_path
+from template import Template
+
+TEMPLATE = "<title>{{ Title }}</title><body>{{ Content }}</body>"
+
+
+def page(title, dest, mtime, **extra):
+    return dict(title=title, dest=os.path.join("docs", *dest.split("/")), mtime=mtime, **extra)
+
+
+class TestSiteIndex(unittest.TestCase):
+    def setUp(self):
+        self.meta = {
+            "content/index.md": page("Home", "index.html", 100),
+            "content/blog/old/index.md": page("Old & dusty", "blog/old/index.html", 200),
+            "content/blog/new/index.md": page(
+                "New",
+                "blog/new/index.html",
+                1,
+                front_matter={"tags": ["Middle Earth"], "date": "2024-01-01"},
+            ),
+        }
+
+    def test_page_url(self):
+        self.assertEqual(page_url(os.path.join("docs", "index.html"), "docs"), "/")
+        self.assertEqual(page_url(os.path.join("docs", "a", "index.html"), "docs"), "/a/")
+        self.assertEqual(page_url(os.path.join("docs", "a.html"), "docs"), "/a.html")
+        self.assertEqual(url_dest_path("/a/", "docs"), os.path.join("docs", "a", "index.html"))
+
+    def test_tags_share_slug(self):
+        self.meta["content/blog/old/index.md"]["front_matter"] = {"tags": "middle-earth"}
+        outputs = build_site_index(self.meta, Template(TEMPLATE), "docs")
+        listing = outputs[os.path.join("docs", "tags", "middle-earth", "index.html")]
+        self.assertIn("<title>Tagged Middle Earth</title>", listing)
+        self.assertEqual(listing.count("<li>"), 2)
+
+    def test_tag_slug(self):
+        self.assertEqual(tag_slug("Middle Earth!"), "middle-earth")
+
+    def test_outputs(self):
+        outputs = build_site_index(self.meta, Template(TEMPLATE, "/site/"), "docs", "https://x.org")
+        self.assertEqual(
+            sorted(outputs),
+            sorted(
+                [
+                    os.path.join("docs", "sitemap.xml"),
+                    os.path.join("docs", "blog", "feed.xml"),
+                    os.path.join("docs", "blog", "index.html"),
+                    os.path.join("docs", "tags", "middle-earth", "index.html"),
+                ]
+            ),
+        )
+        sitemap = outputs[os.path.join("docs", "sitemap.xml")]
+        self.assertIn("<loc>https://x.org/site/blog/</loc>", sitemap)
+        self.assertIn("<loc>https://x.org/site/tags/middle-earth/</loc>", sitemap)
+
+        feed = outputs[os.path.join("docs", "blog", "feed.xml")]
+        self.assertEqual(feed.count("<entry>"), 2)
+        # newest first by front matter date over mtime, and text is escaped
+        self.assertLess(feed.index("<title>New</title>"), feed.index("Old &amp; dusty"))
+        self.assertNotIn("Home", feed)
+
+        listing = outputs[os.path.join("docs", "blog", "index.html")]
+        self.assertTrue(listing.startswith("<title>Blog</title>"))
+        self.assertIn('<a href="/site/blog/new/">New</a>', listing)
+
+    def test_without_site_url(self):
+        outputs = build_site_index(self.meta, Template(TEMPLATE), "docs")
+        self.assertEqual(
+            sorted(outputs),
+            sorted(
+                [
+                    os.path.join("docs", "blog", "index.html"),
+                    os.path.join("docs", "tags", "middle-earth", "index.html"),
+                ]
+            ),
+        )
+
+    def test_content_page_owns_listing(self):
+        self.meta["content/blog/index.md"] = page("My blog", "blog/index.html", 50)
+        outputs = build_site_index(self.meta, Template(TEMPLATE), "docs", "https://x.org")
+        self.assertNotIn(os.path.join("docs", "blog", "index.html"), outputs)
+        self.assertIn(os.path.join("docs", "blog", "feed.xml"), outputs)
+
+    def test_only(self):
+        self.meta["content/blog/old/index.md"]["front_matter"] = {"tags": "Shire"}
+        self.assertEqual(
+            listing_urls(self.meta["content/blog/old/index.md"], "docs"), {"/blog/", "/tags/shire/"}
+        )
+        self.assertEqual(listing_urls(self.meta["content/index.md"], "docs"), set())
+        only = {"/tags/middle-earth/", "/blog/"}
+        outputs = build_site_index(
+            self.meta, Template(TEMPLATE), "docs", "https://x.org", only=only
+        )
+        # no sitemap, and listings outside only are left alone
+        self.assertEqual(
+            sorted(outputs),
+            sorted(
+                [
+                    os.path.join("docs", "blog", "feed.xml"),
+                    os.path.join("docs", "blog", "index.html"),
+                    os.path.join("docs", "tags", "middle-earth", "index.html"),
+                ]
+            ),
+        )
+        self.assertEqual(outputs[os.path.join("docs", "blog", "feed.xml")].count("<entry>"), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
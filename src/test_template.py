@@ -0,0 +1,75 @@
+import unittest
+
+from template import Template, rewrite_basepath
+
+SOURCE = """<html>
+<head><title>{{ Title }}</title><link href="/index.css" rel="stylesheet" /></head>
+<body><article>{{ Content }}</article></body>
+</html>"""
+
+
+class TestTemplate(unittest.TestCase):
+    def test_segments(self):
+        template = Template(SOURCE)
+        self.assertEqual(len(template.segments), 3)
+        self.assertEqual(
+            [name for name, _ in template.slots],
+            ["Title", "Content"],
+        )
+
+    def test_render(self):
+        template = Template(SOURCE)
+        page = template.render({"Title": "Hi", "Content": "<p>there</p>"})
+        self.assertEqual(
+            page,
+            SOURCE.replace("{{ Title }}", "Hi").replace(
+                "{{ Content }}", "<p>there</p>"
+            ),
+        )
+
+    def test_render_basepath(self):
+        template = Template(SOURCE, "/site/")
+        self.assertIn('href="/site/index.css"', template.segments[1])
+        page = template.render(
+            {"Title": "Hi", "Content": '<a href="/blog">x</a><img src="/a.png" alt="">'}
+        )
+        self.assertIn('<a href="/site/blog">x</a>', page)
+        self.assertIn('<img src="/site/a.png" alt="">', page)
+        self.assertIn('href="/site/index.css"', page)
+
+    def test_render_missing_slot(self):
+        template = Template("<title>{{ Title }}</title>{{ Other }}")
+        self.assertEqual(
+            template.render({"Title": "Hi"}),
+            "<title>Hi</title>{{ Other }}",
+        )
+
+    def test_write_streamed_slot(self):
+        template = Template(SOURCE, "/site/")
+
+        def content(write):
+            write('<a href="/blog">')
+            write("x</a>")
+
+        parts = []
+        template.write(parts.append, {"Title": "Hi", "Content": content})
+        self.assertEqual(
+            "".join(parts),
+            template.render({"Title": "Hi", "Content": '<a href="/blog">x</a>'}),
+        )
+        self.assertIn('<a href="/site/blog">', parts)
+
+    def test_rewrite_basepath_root(self):
+        html = '<a href="/x">x</a>'
+        self.assertEqual(rewrite_basepath(html, "/"), html)
+
+    def test_rewrite_basepath_srcset(self):
+        html = '<img src="/a.png" srcset="/a-480w.webp 480w, https://x.org/a.webp 960w">'
+        self.assertEqual(
+            rewrite_basepath(html, "/site/"),
+            '<img src="/site/a.png" srcset="/site/a-480w.webp 480w, https://x.org/a.webp 960w">',
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,6 +1,8 @@
 from enum import Enum
 
+from assets import asset_url
 from htmlnode import LeafNode
+from images import image_attributes
 
 
 class TextType(Enum):
@@ -13,6 +15,8 @@ class TextType(Enum):
 
 
 class TextNode:
+    __slots__ = ("text", "text_type", "url")
+
     def __init__(self, text, text_type, url=None):
         self.text = text
         self.text_type = text_type
@@ -39,7 +43,9 @@ def text_node_to_html_node(text_node):
     if text_node.text_type == TextType.CODE:
         return LeafNode("code", text_node.text)
     if text_node.text_type == TextType.LINK:
-        return LeafNode("a", text_node.text, {"href": text_node.url})
+        return LeafNode("a", text_node.text, {"href": asset_url(text_node.url)})
     if text_node.text_type == TextType.IMAGE:
-        return LeafNode("img", "", {"src": text_node.url, "alt": text_node.text})
+        props = {"src": asset_url(text_node.url), "alt": text_node.text}
+        props.update(image_attributes(text_node.url))
+        return LeafNode("img", "", props)
     raise ValueError(f"invalid text type: {text_node.text_type}")